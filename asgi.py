@@ -0,0 +1,252 @@
+""" ASGI entry point of our application
+
+Event loop owns connections, so slow clients and idle keep-alive
+connections don't hold threads. Request body is read by the loop, then
+unchanged WSGI application (handlers, sqlite3 access, waiting for
+password hashing processes) runs on a bounded thread pool.
+
+Usage
+-----
+uvicorn asgi:app
+
+Attributes
+----------
+app : ASGIApplication
+    Application for ASGI servers, templates are precompiled
+"""
+import io
+import sys
+import asyncio
+from typing import Callable
+from concurrent.futures import ThreadPoolExecutor
+
+from run import construct_app
+from config import SERVER_THREADS, ASGI_MAX_BODY_SIZE
+from data_base import pool, writer, migrate, init_notes_search
+from controllers.cache_controllers import sync_title_index
+from controllers.hashing_controllers import hasher
+
+
+class ASGIApplication:
+    """ Adapts WSGI application to ASGI, handles http and lifespan scopes
+
+    Parameters
+    ----------
+    wsgi_app : Callable
+    threads : int, optional
+        Max count of requests handled at the same time
+    max_body_size : int, optional
+        Bigger request bodies are answered with 413
+
+    """
+    def __init__(
+        self,
+        wsgi_app: Callable,
+        threads: int = SERVER_THREADS,
+        max_body_size: int = ASGI_MAX_BODY_SIZE
+    ):
+        self.wsgi_app = wsgi_app
+        self.threads = threads
+        self.max_body_size = max_body_size
+        self.executor: ThreadPoolExecutor | None = None
+
+    async def __call__(self, scope: dict, receive, send) -> None:
+        if scope["type"] == "http":
+            await self.handle_http(scope, receive, send)
+        elif scope["type"] == "lifespan":
+            await self.handle_lifespan(receive, send)
+
+    async def handle_lifespan(self, receive, send) -> None:
+        """ Prepares database on startup, closes resources on shutdown
+        """
+        while True:
+            message: dict = await receive()
+
+            if message["type"] == "lifespan.startup":
+                try:
+                    await self.run(migrate)
+                    await self.run(init_notes_search)
+                    await self.run(sync_title_index)
+                except Exception as error:
+                    await send({
+                        "type": "lifespan.startup.failed",
+                        "message": repr(error)
+                    })
+                    return
+
+                await send({"type": "lifespan.startup.complete"})
+
+            elif message["type"] == "lifespan.shutdown":
+                await self.run(self.close_resources)
+                self.executor.shutdown()
+                self.executor = None
+
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def handle_http(self, scope: dict, receive, send) -> None:
+        """ Reads request body, runs WSGI application in thread pool and
+            sends its response
+        """
+        body = bytearray()
+
+        while True:
+            message: dict = await receive()
+
+            if message["type"] == "http.disconnect":
+                return
+
+            body += message.get("body", b"")
+            if len(body) > self.max_body_size:
+                await send_response(
+                    send, "413 Request Entity Too Large", [], b""
+                )
+                return
+
+            if not message.get("more_body"):
+                break
+
+        status, headers, content = await self.run(
+            self.call_wsgi, build_environ(scope, bytes(body))
+        )
+        await send_response(send, status, headers, content)
+
+    def call_wsgi(self, environ: dict) -> tuple[str, list, bytes]:
+        """ Calls WSGI application, runs inside thread pool
+
+        Parameters
+        ----------
+        environ : dict
+
+        Returns
+        -------
+        tuple[str, list, bytes]
+            Status, headers and body
+
+        """
+        response: list = []
+
+        def start_response(status: str, headers: list, exc_info=None):
+            response[:] = [status, headers]
+
+        result = self.wsgi_app(environ, start_response)
+        try:
+            content: bytes = b"".join(result)
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+
+        return response[0], response[1], content
+
+    async def run(self, func: Callable, *args):
+        """ Runs blocking function in thread pool of application
+        """
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(
+                self.threads, thread_name_prefix="asgi"
+            )
+
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, func, *args
+        )
+
+    @staticmethod
+    def close_resources() -> None:
+        writer.close()
+        pool.close()
+        hasher.close()
+
+
+def build_environ(scope: dict, body: bytes) -> dict:
+    """ Builds WSGI environ from ASGI http scope
+
+    Parameters
+    ----------
+    scope : dict
+    body : bytes
+
+    Returns
+    -------
+    dict
+
+    """
+    server_name, server_port = scope.get("server") or ("localhost", 80)
+    environ: dict = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode().decode("latin1"),
+        "PATH_INFO": scope["path"].encode().decode("latin1"),
+        "QUERY_STRING": scope["query_string"].decode("latin1"),
+        "SERVER_NAME": server_name,
+        "SERVER_PORT": str(server_port),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+
+    if client := scope.get("client"):
+        environ["REMOTE_ADDR"] = client[0]
+
+    for name, value in scope.get("headers", []):
+        name = name.decode("latin1").upper().replace("-", "_")
+        value = value.decode("latin1")
+
+        if name == "CONTENT_TYPE":
+            environ["CONTENT_TYPE"] = value
+        elif name != "CONTENT_LENGTH":
+            key: str = f"HTTP_{name}"
+            separator: str = "; " if name == "COOKIE" else ","
+            environ[key] = f"{environ[key]}{separator}{value}" \
+                if key in environ else value
+
+    environ.setdefault("HTTP_HOST", f"{server_name}:{server_port}")
+
+    return environ
+
+
+async def send_response(
+    send,
+    status: str,
+    headers: list,
+    content: bytes
+) -> None:
+    """ Sends whole response to ASGI server
+
+    Parameters
+    ----------
+    send : Callable
+    status : str
+        WSGI status line, e.g. "200 OK"
+    headers : list
+        WSGI headers
+    content : bytes
+
+    """
+    await send({
+        "type": "http.response.start",
+        "status": int(status[:3]),
+        "headers": [
+            (name.lower().encode("latin1"), value.encode("latin1"))
+            for name, value in headers
+        ],
+    })
+    await send({"type": "http.response.body", "body": content})
+
+
+def construct_asgi_app() -> ASGIApplication:
+    """ Constructs ASGI application around production WSGI application
+
+    Returns
+    -------
+    ASGIApplication
+
+    """
+    return ASGIApplication(construct_app(production=True))
+
+
+app = construct_asgi_app()
@@ -0,0 +1,256 @@
+""" Build step and serving of precompressed, content hashed static files
+
+Build writes every file from static directory as ``name.<hash>.ext`` with
+``.gz`` and ``.br`` (when brotli is installed) variants next to it, and
+manifest that maps original paths to hashed ones. Hashed files never
+change, so they are served with immutable caching headers.
+
+Attributes
+----------
+MANIFEST_NAME : str
+    Name of manifest file inside assets directory
+ENCODINGS : tuple
+    Content encodings of precompressed variants with their file suffixes,
+    in order of preference
+COMPRESSIBLE_TYPES : tuple
+    Prefixes of mime types that get precompressed variants
+IMMUTABLE_MAX_AGE : int
+    Max age of hashed files in seconds, one year
+"""
+import os
+import gzip
+import json
+import hashlib
+import mimetypes
+from functools import lru_cache
+
+from wheezy.http import HTTPResponse, HTTPCachePolicy, not_found, forbidden
+from wheezy.web.handlers import MethodHandler
+
+from config import STATIC_PATH, ASSETS_PATH
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+MANIFEST_NAME: str = "manifest.json"
+
+ENCODINGS: tuple = (("br", ".br"), ("gzip", ".gz"))
+
+COMPRESSIBLE_TYPES: tuple = ("text/", "application/javascript", "image/svg")
+
+IMMUTABLE_MAX_AGE: int = 365 * 24 * 60 * 60
+
+
+def build_assets(
+    source: str = STATIC_PATH,
+    target: str = ASSETS_PATH
+) -> dict:
+    """ Writes content hashed copies of static files with their
+        precompressed variants and manifest
+
+    Parameters
+    ----------
+    source : str, optional
+        Directory with original static files
+    target : str, optional
+        Directory for built files
+
+    Returns
+    -------
+    dict
+        Manifest, hashed paths by original ones
+
+    """
+    manifest: dict = {}
+
+    for directory, _, files in os.walk(source):
+        for name in files:
+            path: str = os.path.relpath(
+                os.path.join(directory, name), source
+            ).replace(os.sep, "/")
+
+            with open(os.path.join(source, path), "rb") as file:
+                content: bytes = file.read()
+
+            stem, extension = os.path.splitext(path)
+            hashed: str = (
+                f"{stem}.{hashlib.sha256(content).hexdigest()[:12]}"
+                f"{extension}"
+            )
+            manifest[path] = hashed
+
+            write_asset(os.path.join(target, hashed), content)
+
+    with open(os.path.join(target, MANIFEST_NAME), "w") as file:
+        json.dump(manifest, file, indent=1, sort_keys=True)
+
+    return manifest
+
+
+def write_asset(path: str, content: bytes) -> None:
+    """ Writes file with it's compressed variants, variants that aren't
+        smaller than original are skipped
+
+    Parameters
+    ----------
+    path : str
+    content : bytes
+
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with open(path, "wb") as file:
+        file.write(content)
+
+    mime_type, _ = mimetypes.guess_type(path)
+    if not (mime_type or "").startswith(COMPRESSIBLE_TYPES):
+        return
+
+    variants: dict = {".gz": gzip.compress(content, 9, mtime=0)}
+    if brotli:
+        variants[".br"] = brotli.compress(content, quality=11)
+
+    for suffix, compressed in variants.items():
+        if len(compressed) < len(content):
+            with open(path + suffix, "wb") as file:
+                file.write(compressed)
+
+
+def load_manifest(target: str = ASSETS_PATH) -> dict:
+    """ Reads manifest of built assets, it is empty when assets weren't
+        built, then original static files are used
+
+    Parameters
+    ----------
+    target : str, optional
+
+    Returns
+    -------
+    dict
+
+    """
+    try:
+        with open(os.path.join(target, MANIFEST_NAME)) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def assets_bootstrap(manifest: dict):
+    """ Middleware factory that makes ``path_for('static', path=...)``
+        return hashed assets urls. Has to follow bootstrap_defaults.
+
+    Parameters
+    ----------
+    manifest : dict
+
+    """
+    def load(options: dict) -> None:
+        if not manifest:
+            return
+
+        path_for = options["path_for"]
+
+        def assets_path_for(name: str, **kwargs) -> str:
+            if name == "static" and (
+                hashed := manifest.get(kwargs.get("path"))
+            ):
+                return path_for("assets", path=hashed)
+
+            return path_for(name, **kwargs)
+
+        options["path_for"] = assets_path_for
+
+    return load
+
+
+def assets_handler(root: str = ASSETS_PATH):
+    """ Serves built assets out of directory
+
+    Parameters
+    ----------
+    root : str, optional
+
+    """
+    root = os.path.abspath(root)
+    return lambda request: AssetsHandler(request, root=root)
+
+
+class AssetsHandler(MethodHandler):
+    """ Serves built asset, picks precompressed variant by Accept-Encoding
+    """
+    def __init__(self, request, root: str):
+        self.root = root
+        super().__init__(request)
+
+    def head(self) -> HTTPResponse:
+        return self.get(skip_body=True)
+
+    def get(self, skip_body: bool = False) -> HTTPResponse:
+        """ Gives back asset file
+
+        Parameters
+        ----------
+        skip_body : bool, optional
+
+        Returns
+        -------
+        HTTPResponse
+            Wheezy.http response object
+
+        """
+        path: str = os.path.abspath(
+            os.path.join(self.root, self.route_args["path"])
+        )
+        if not path.startswith(self.root + os.sep) or \
+                path.endswith(MANIFEST_NAME):
+            return forbidden()
+
+        accepted: str = self.request.environ.get("HTTP_ACCEPT_ENCODING", "")
+
+        for encoding, suffix in ENCODINGS:
+            if encoding in accepted and (
+                content := read_asset(path + suffix)
+            ) is not None:
+                break
+        else:
+            encoding = None
+            if (content := read_asset(path)) is None:
+                return not_found()
+
+        mime_type, _ = mimetypes.guess_type(path)
+        response = HTTPResponse(mime_type or "application/octet-stream")
+        response.cache_policy = policy = HTTPCachePolicy("public")
+        policy.max_age(IMMUTABLE_MAX_AGE)
+        policy.append_extension("immutable")
+        policy.vary("Accept-Encoding")
+        if encoding:
+            response.headers.append(("Content-Encoding", encoding))
+
+        if not skip_body:
+            response.write_bytes(content)
+
+        return response
+
+
+@lru_cache(maxsize=1024)
+def read_asset(path: str) -> bytes | None:
+    """ Reads asset file once, hashed files never change
+
+    Parameters
+    ----------
+    path : str
+
+    Returns
+    -------
+    bytes | None
+
+    """
+    try:
+        with open(path, "rb") as file:
+            return file.read()
+    except (FileNotFoundError, IsADirectoryError):
+        return None
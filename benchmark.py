@@ -0,0 +1,531 @@
+""" In-process benchmark of every route of our wsgi application
+
+Seeds throwaway database, drives construct_app() with WSGI calls and
+reports throughput with p50/p95/p99 latency as JSON. When baseline is
+given, fails with exit code 1 if any scenario regressed more than
+threshold allows.
+
+Usage
+-----
+python benchmark.py --output bench.json
+python benchmark.py --baseline bench.json --threshold 0.25
+"""
+import io
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import statistics
+from urllib.parse import urlencode
+from typing import Callable, Iterator
+
+
+BENCH_PASSWORD: str = "Benchmark1"
+
+
+class Client:
+    """ Calls wsgi application in-process, keeps cookies between calls
+
+    Parameters
+    ----------
+    app : Callable
+        Wsgi application
+
+    """
+    def __init__(self, app: Callable):
+        self.app = app
+        self.cookies: dict = {}
+
+    def call(
+        self,
+        method: str,
+        path: str,
+        form: dict | None = None,
+        headers: dict | None = None
+    ) -> tuple[str, bytes]:
+        """ Makes request
+
+        Parameters
+        ----------
+        method : str
+        path : str
+            Path with optional query string
+        form : dict | None, optional
+        headers : dict | None, optional
+            Additional wsgi environ keys, e.g. HTTP_ACCEPT_ENCODING
+
+        Returns
+        -------
+        tuple[str, bytes]
+            Status and body
+
+        """
+        path, _, query = path.partition("?")
+        body: bytes = urlencode(form or {}).encode()
+        environ: dict = {
+            "REQUEST_METHOD": method,
+            "PATH_INFO": path,
+            "QUERY_STRING": query,
+            "SCRIPT_NAME": "",
+            "SERVER_NAME": "localhost",
+            "SERVER_PORT": "8080",
+            "HTTP_HOST": "localhost:8080",
+            "CONTENT_TYPE": "application/x-www-form-urlencoded",
+            "CONTENT_LENGTH": str(len(body)),
+            "wsgi.url_scheme": "http",
+            "wsgi.input": io.BytesIO(body),
+            "wsgi.errors": sys.stderr,
+            **(headers or {}),
+        }
+        if self.cookies:
+            environ["HTTP_COOKIE"] = "; ".join(
+                f"{name}={value}" for name, value in self.cookies.items()
+            )
+
+        response: dict = {}
+
+        def start_response(status, response_headers, exc_info=None):
+            response["status"] = status
+            response["headers"] = response_headers
+
+        content: bytes = b"".join(self.app(environ, start_response))
+
+        for name, value in response["headers"]:
+            if name.lower() == "set-cookie":
+                name, _, value = value.split(";", 1)[0].partition("=")
+                if value:
+                    self.cookies[name] = value
+                else:
+                    self.cookies.pop(name, None)
+
+        return response["status"], content
+
+
+def seed(users: int, notes: int) -> None:
+    """ Fills fresh database with users and notes. All users share the
+        same password, hashed once.
+
+    Parameters
+    ----------
+    users : int
+    notes : int
+
+    """
+    from data_base import CursorContextManager, migrate, init_notes_search
+    from controllers.hashing_controllers import hasher
+    from controllers.notes_controllers import define_excerpt
+
+    migrate()
+    password_hash: str = hasher.hash(BENCH_PASSWORD)
+    rng = random.Random(0)
+    words: list = ["alpha", "beta", "gamma", "delta", "omega", "lorem"]
+
+    with CursorContextManager() as cursor:
+        cursor.executemany(
+            '''INSERT INTO users (email, phone_number, username, password)
+            VALUES (?, ?, ?, ?)''',
+            (
+                (f"user{i}@bench.com", str(100000000 + i), f"user{i}",
+                 password_hash)
+                for i in range(users)
+            )
+        )
+        cursor.executemany(
+            '''INSERT INTO notes (
+                title, body, created, author_id, excerpt, body_length,
+                has_body
+            )
+            VALUES (
+                :title, :body, :created, :author_id, :excerpt, :body_length,
+                :has_body
+            )''',
+            (
+                dict(
+                    define_excerpt(body),
+                    title=title,
+                    body=body,
+                    created="2024-01-01 00:00",
+                    author_id=i % users + 1
+                )
+                for i in range(notes)
+                for title, body in [(
+                    f"{rng.choice(words)} note {i}",
+                    " ".join(rng.choices(words, k=40))
+                )]
+            )
+        )
+        cursor.connection.commit()
+
+    init_notes_search()
+
+
+def scenarios(
+    client: Client,
+    anonymous: Client,
+    users: int,
+    notes: int
+) -> dict[str, tuple[str, Callable[[int], tuple]]]:
+    """ Defines benchmark scenarios
+
+    Parameters
+    ----------
+    client : Client
+        Client of logged in user, author of every users-th note
+    anonymous : Client
+    users : int
+    notes : int
+
+    Returns
+    -------
+    dict[str, tuple[str, Callable[[int], tuple]]]
+        Route name and function that makes i-th request by scenario name
+
+    """
+    from controllers.pages_controllers import POSTS_PER_PAGE
+
+    own_posts: list = list(range(1, notes + 1, users))
+    last_page: int = max(1, (notes + POSTS_PER_PAGE - 1) // POSTS_PER_PAGE)
+    gzip: dict = {"HTTP_ACCEPT_ENCODING": "gzip, br"}
+    prefixes: tuple = ("a", "be", "gam", "omega+n", "lorem+note+1", "zz")
+
+    def own_post(i: int) -> int:
+        return own_posts[i % len(own_posts)]
+
+    return {
+        "index": ("index", lambda i: anonymous.call("GET", "/")),
+        "home_first": ("home", lambda i: anonymous.call("GET", "/home")),
+        "home_middle": ("home", lambda i: anonymous.call(
+            "GET", f"/home?page={last_page // 2}"
+        )),
+        "home_last": ("home", lambda i: anonymous.call(
+            "GET", f"/home?page={last_page}"
+        )),
+        "home_cursor": ("home", lambda i: anonymous.call(
+            "GET", f"/home?page=2&after={notes // 2 + i % 100}"
+        )),
+        "home_user": ("home", lambda i: client.call("GET", "/home")),
+        "my_posts": ("my_posts", lambda i: client.call("GET", "/my_posts")),
+        "my_posts_cursor": ("my_posts", lambda i: client.call(
+            "GET", f"/my_posts?before={own_post(i) + 1}"
+        )),
+        "search_page": ("search", lambda i: anonymous.call("GET", "/search")),
+        "search_hit": ("search", lambda i: anonymous.call(
+            "POST", "/search", {"search_keyword": "omega note"}
+        )),
+        "search_miss": ("search", lambda i: anonymous.call(
+            "POST", "/search", {"search_keyword": f"missing{i}"}
+        )),
+        "search_suggest": ("search_suggest", lambda i: anonymous.call(
+            "GET", f"/search/suggest?q={prefixes[i % len(prefixes)]}"
+        )),
+        "read_post": ("read_post", lambda i: anonymous.call(
+            "GET", f"/read_post/{i % notes + 1}"
+        )),
+        "read_posts": ("read_posts", lambda i: anonymous.call(
+            "GET", "/read_posts?ids=" + ",".join(
+                str((i * 20 + offset) % notes + 1) for offset in range(20)
+            )
+        )),
+        "create_post_page": ("crate_post", lambda i: client.call(
+            "GET", "/create_post"
+        )),
+        "create_post": ("crate_post", lambda i: client.call(
+            "POST", "/create_post", {"title": f"bench {i}", "body": "text"}
+        )),
+        "update_post_page": ("update_post", lambda i: client.call(
+            "GET", f"/update_post/{own_post(i)}"
+        )),
+        "update_post": ("update_post", lambda i: client.call(
+            "POST", f"/update_post/{own_post(i)}",
+            {"title": f"updated {i}", "body": "text"}
+        )),
+        "delete_post": ("delete_post", lambda i: client.call(
+            "POST", f"/delete_post/{own_post(-i - 1)}"
+        )),
+        "login_page": ("login", lambda i: anonymous.call("GET", "/login")),
+        "login": ("login", lambda i: Client(client.app).call(
+            "POST", "/login",
+            {"email": f"user{i % users}@bench.com",
+             "password": BENCH_PASSWORD}
+        )),
+        "logout": ("logout", lambda i: logout(client)),
+        "register_page": ("register", lambda i: anonymous.call(
+            "GET", "/register"
+        )),
+        "register": ("register", lambda i: Client(client.app).call(
+            "POST", "/register",
+            {"email": f"new{i}@bench.com", "phone_number": str(900000000 + i),
+             "username": f"new{i}", "password": BENCH_PASSWORD,
+             "password_repeat": BENCH_PASSWORD}
+        )),
+        "api_notes": ("api_notes", lambda i: anonymous.call(
+            "GET", f"/api/notes?limit=50&cursor={api_cursor(i % notes)}"
+        )),
+        "api_notes_author": ("api_notes", lambda i: anonymous.call(
+            "GET", f"/api/notes?limit=50&author_id={i % users + 1}"
+        )),
+        "metrics": ("metrics", lambda i: anonymous.call("GET", "/metrics")),
+        "static": ("static", lambda i: anonymous.call(
+            "GET", "/static/css/home.css", headers=gzip
+        )),
+        "assets": ("assets", lambda i: anonymous.call(
+            "GET", assets_url(), headers=gzip
+        )),
+    }
+
+
+def logout(client: Client) -> tuple[str, bytes]:
+    """ Logs out copy of logged in client, so client itself stays
+        authenticated for other scenarios
+    """
+    copy = Client(client.app)
+    copy.cookies.update(client.cookies)
+    return copy.call("GET", "/logout")
+
+
+def login(client: Client, email: str = "user0@bench.com") -> None:
+    """ Logs client in as seeded user
+    """
+    client.call("POST", "/login", {"email": email, "password": BENCH_PASSWORD})
+
+
+def api_cursor(after: int) -> str:
+    """ Cursor of feed API page that starts after given note
+    """
+    from controllers.api_controllers import encode_cursor
+
+    return encode_cursor(after, None, None)
+
+
+def assets_url() -> str:
+    """ Url of built asset, falls back to static one when assets
+        weren't built
+    """
+    from assets import load_manifest
+
+    hashed: str | None = load_manifest().get("css/home.css")
+    return f"/assets/{hashed}" if hashed else "/static/css/home.css"
+
+
+def measure(
+    make_request: Callable[[int], tuple],
+    count: int,
+    start: int = 0
+) -> dict:
+    """ Runs scenario count times and summarises latencies
+
+    Parameters
+    ----------
+    make_request : Callable[[int], tuple]
+    count : int
+    start : int, optional
+        Index of first request, requests after warmup must not repeat
+        warmup ones (e.g. register same email)
+
+    Returns
+    -------
+    dict
+        requests, errors, rps, p50/p95/p99 in milliseconds
+
+    """
+    latencies: list = []
+    errors: int = 0
+    started: float = time.perf_counter()
+
+    for i in range(start, start + count):
+        request_started: float = time.perf_counter()
+        status, _ = make_request(i)
+        latencies.append((time.perf_counter() - request_started) * 1000)
+
+        if not status.startswith(("2", "3")):
+            errors += 1
+
+    elapsed: float = time.perf_counter() - started
+    cuts: list = statistics.quantiles(latencies, n=100, method="inclusive")
+
+    return {
+        "requests": count,
+        "errors": errors,
+        "rps": round(count / elapsed, 1),
+        "p50": round(cuts[49], 3),
+        "p95": round(cuts[94], 3),
+        "p99": round(cuts[98], 3),
+    }
+
+
+def compare(report: dict, baseline: dict, threshold: float) -> Iterator[str]:
+    """ Yields regressions of report against baseline
+
+    Parameters
+    ----------
+    report : dict
+    baseline : dict
+    threshold : float
+        Allowed relative slowdown, 0.25 allows 25% higher p95 and 25%
+        lower throughput
+
+    """
+    for name, before in baseline["scenarios"].items():
+        if (after := report["scenarios"].get(name)) is None:
+            continue
+
+        if after["p95"] > before["p95"] * (1 + threshold):
+            yield f"{name}: p95 {before['p95']} -> {after['p95']} ms"
+
+        if after["rps"] < before["rps"] / (1 + threshold):
+            yield f"{name}: rps {before['rps']} -> {after['rps']}"
+
+
+def run_benchmark(args: argparse.Namespace) -> dict:
+    """ Seeds database, runs every scenario and returns report
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+
+    Returns
+    -------
+    dict
+
+    """
+    # Application modules read configuration on import, so they are
+    # imported after database path is pointed to throwaway one
+    from run import construct_app
+    from urls import all_urls
+
+    seed(args.users, args.notes)
+
+    app = construct_app(production=True)
+    client, anonymous = Client(app), Client(app)
+    login(client)
+
+    report: dict = {
+        "users": args.users,
+        "notes": args.notes,
+        "scenarios": {},
+    }
+    covered: set = set()
+
+    for name, (route, make_request) in scenarios(
+        client, anonymous, args.users, args.notes
+    ).items():
+        if args.only and name not in args.only:
+            continue
+
+        count: int = args.requests
+        if name in ("login", "register"):
+            count = max(5, count // args.hashing_divisor)
+
+        warmup: int = min(args.warmup, count)
+        for i in range(warmup):
+            make_request(i)
+
+        report["scenarios"][name] = measure(make_request, count, warmup)
+        covered.add(route)
+        print(name, report["scenarios"][name], file=sys.stderr)
+
+    if not args.only:
+        report["uncovered_routes"] = sorted(
+            route[3] for route in all_urls if route[3] not in covered
+        )
+
+    return report
+
+
+def parse_args() -> argparse.Namespace:
+    """ Parses command line arguments of benchmark
+
+    Returns
+    -------
+    argparse.Namespace
+
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--notes", type=int, default=20000)
+    parser.add_argument(
+        "--requests",
+        type=int,
+        default=300,
+        help="measured requests per scenario"
+    )
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument(
+        "--hashing-divisor",
+        type=int,
+        default=10,
+        help="login and register make requests/divisor calls"
+    )
+    parser.add_argument(
+        "--only",
+        nargs="*",
+        help="names of scenarios to run, all by default"
+    )
+    parser.add_argument("--output", help="file for JSON report")
+    parser.add_argument("--baseline", help="JSON report to compare with")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="allowed relative regression of p95 latency and throughput"
+    )
+    return parser.parse_args()
+
+
+def main() -> int:
+    """ Runs benchmark in temporary directory
+
+    Returns
+    -------
+    int
+        Exit code, 1 when there are regressions or uncovered routes
+
+    """
+    args = parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["DATA_BASE_PATH"] = os.path.join(
+            directory, "benchmark.sqlite3"
+        )
+        os.environ["TEMPLATE_CACHE_PATH"] = os.path.join(
+            directory, "templates"
+        )
+
+        try:
+            report: dict = run_benchmark(args)
+        finally:
+            from data_base import pool, writer
+            from controllers.hashing_controllers import hasher
+
+            writer.close()
+            pool.close()
+            hasher.close()
+
+    output: str = json.dumps(report, indent=1)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output)
+    else:
+        print(output)
+
+    failures: list = [
+        f"route isn't covered: {route}"
+        for route in report.get("uncovered_routes", [])
+    ]
+    if args.baseline:
+        with open(args.baseline) as file:
+            failures.extend(compare(report, json.load(file), args.threshold))
+
+    for failure in failures:
+        print(failure, file=sys.stderr)
+
+    return 1 if failures else 0
+
+
+# Password hashing pool spawns processes that import this module again,
+# so benchmark has to run only from main process
+if __name__ == "__main__":
+    sys.exit(main())
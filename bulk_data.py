@@ -0,0 +1,320 @@
+""" Streaming bulk import and export of table rows as JSONL
+
+Import writes rows with chunked executemany inside large transactions.
+Full-text search and counters triggers of table are dropped for the time
+of import and restored after it, search index and counters are rebuilt
+once whenever any rows were committed, also after failed import. Indexes
+stay in place, so the application can keep serving reads during import.
+Export iterates cursor, so memory stays flat for any count of rows.
+
+Attributes
+----------
+BULK_TABLES : tuple
+    Tables that can be imported and exported
+"""
+import sys
+import json
+import time
+import sqlite3
+from itertools import islice
+from typing import Iterable, Iterator, TextIO
+
+from data_base import (
+    pool,
+    init_notes_search,
+    rebuild_notes_search,
+    rebuild_post_counters
+)
+from controllers.notes_controllers import define_excerpt
+
+
+BULK_TABLES: tuple = ("users", "notes")
+
+
+def import_rows(
+    table: str,
+    rows: Iterable[dict],
+    chunk_size: int = 5000,
+    transaction_size: int = 200000
+) -> Iterator[int]:
+    """ Inserts rows into table, yields count of inserted rows after every
+        committed transaction. Rows keep their ids if they have them.
+
+    Parameters
+    ----------
+    table : str
+        One of BULK_TABLES
+    rows : Iterable[dict]
+        Rows by column names, users are expected with hashed passwords,
+        notes are completed by prepare_note
+    chunk_size : int, optional
+        Rows per executemany call
+    transaction_size : int, optional
+        Rows per transaction
+
+    Raises
+    ------
+    ValueError
+        If table isn't supported or row has unknown column
+
+    """
+    if table not in BULK_TABLES:
+        raise ValueError(f"Table {table} can't be imported.")
+
+    connection: sqlite3.Connection = pool.connect()
+    connection.isolation_level = None
+    columns: set = {
+        column["name"] for column in
+        connection.execute(f"PRAGMA table_info({table})")
+    }
+    deferred: list = defer_triggers(connection, table)
+    inserted: int = 0
+    rows = iter(rows) if table != "notes" else map(prepare_note, rows)
+
+    try:
+        while True:
+            connection.execute("BEGIN IMMEDIATE")
+            in_transaction: int = 0
+
+            while in_transaction < transaction_size and (
+                chunk := list(islice(rows, chunk_size))
+            ):
+                for keys, group in group_by_keys(chunk):
+                    if unknown := set(keys) - columns:
+                        raise ValueError(
+                            f"Unknown columns of {table}: {sorted(unknown)}"
+                        )
+
+                    connection.executemany(
+                        f"INSERT INTO {table} ({', '.join(keys)}) "
+                        f"VALUES ({', '.join(':' + key for key in keys)})",
+                        group
+                    )
+
+                in_transaction += len(chunk)
+
+            connection.execute("COMMIT")
+            inserted += in_transaction
+
+            if in_transaction < transaction_size:
+                break
+
+            yield inserted
+    except BaseException:
+        if connection.in_transaction:
+            connection.execute("ROLLBACK")
+        raise
+    finally:
+        restore_triggers(connection, deferred)
+        connection.close()
+
+        if inserted and table == "notes":
+            rebuild_post_counters()
+
+            if init_notes_search():
+                rebuild_notes_search()
+
+    yield inserted
+
+
+def prepare_note(row: dict) -> dict:
+    """ Fills excerpt of note from body when it is missing. Deleted note
+        without updated time gets time of import, so it stays for the
+        whole retention window before it is archived.
+
+    Parameters
+    ----------
+    row : dict
+
+    Returns
+    -------
+    dict
+
+    """
+    if "excerpt" not in row:
+        row = dict(row, **define_excerpt(row.get("body")))
+
+    if row.get("deleted") and row.get("updated") is None:
+        row = dict(row, updated=int(time.time()))
+
+    return row
+
+
+def defer_triggers(
+    connection: sqlite3.Connection,
+    table: str
+) -> list[str]:
+    """ Drops full-text search and counters triggers of table
+
+    Parameters
+    ----------
+    connection : sqlite3.Connection
+    table : str
+
+    Returns
+    -------
+    list[str]
+        SQL that creates dropped triggers again
+
+    """
+    deferred: list = connection.execute(
+        '''
+        SELECT name, sql FROM sqlite_master
+        WHERE tbl_name = ? AND type = 'trigger' AND (
+            name LIKE '%\\_fts\\_%' ESCAPE '\\'
+            OR name LIKE '%\\_counters\\_%' ESCAPE '\\'
+        )
+        ''',
+        (table,)
+    ).fetchall()
+
+    connection.execute("BEGIN IMMEDIATE")
+    for name, _ in deferred:
+        connection.execute(f'DROP TRIGGER "{name}"')
+    connection.execute("COMMIT")
+
+    return [sql for _, sql in deferred]
+
+
+def restore_triggers(
+    connection: sqlite3.Connection,
+    deferred: list[str]
+) -> None:
+    """ Creates dropped triggers again, refreshes statistics of planner
+
+    Parameters
+    ----------
+    connection : sqlite3.Connection
+    deferred : list[str]
+        SQL from defer_triggers
+
+    """
+    connection.execute("BEGIN IMMEDIATE")
+    for sql in deferred:
+        connection.execute(sql)
+    connection.execute("COMMIT")
+
+    connection.execute("ANALYZE")
+
+
+def group_by_keys(chunk: list[dict]) -> Iterator[tuple[tuple, list]]:
+    """ Splits chunk into groups of rows with the same columns, order of
+        rows is kept
+
+    Parameters
+    ----------
+    chunk : list[dict]
+
+    """
+    keys: tuple | None = None
+    group: list = []
+
+    for row in chunk:
+        if (row_keys := tuple(row)) != keys:
+            if group:
+                yield keys, group
+            keys, group = row_keys, []
+
+        group.append(row)
+
+    if group:
+        yield keys, group
+
+
+def export_rows(table: str) -> Iterator[dict]:
+    """ Yields rows of table ordered by id, reads one consistent snapshot
+
+    Parameters
+    ----------
+    table : str
+        One of BULK_TABLES
+
+    Raises
+    ------
+    ValueError
+        If table isn't supported
+
+    """
+    if table not in BULK_TABLES:
+        raise ValueError(f"Table {table} can't be exported.")
+
+    connection: sqlite3.Connection = pool.connect()
+
+    try:
+        for row in connection.execute(f"SELECT * FROM {table} ORDER BY id"):
+            yield dict(row)
+    finally:
+        connection.close()
+
+
+def read_jsonl(file: TextIO) -> Iterator[dict]:
+    """ Yields objects of JSONL file, empty lines are skipped
+
+    Parameters
+    ----------
+    file : TextIO
+
+    """
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def write_jsonl(file: TextIO, rows: Iterable[dict]) -> Iterator[int]:
+    """ Writes rows to JSONL file, yields count of written rows
+
+    Parameters
+    ----------
+    file : TextIO
+    rows : Iterable[dict]
+
+    """
+    for written, row in enumerate(rows, 1):
+        file.write(json.dumps(row, ensure_ascii=False))
+        file.write("\n")
+        yield written
+
+
+def report_progress(
+    counts: Iterable[int],
+    every: int = 1,
+    output: TextIO | None = None
+) -> int:
+    """ Consumes progress counts, prints rows and rows per second
+
+    Parameters
+    ----------
+    counts : Iterable[int]
+        Growing counts of processed rows
+    every : int, optional
+        Print every n-th count
+    output : TextIO | None, optional
+        Stream for progress, stderr by default
+
+    Returns
+    -------
+    int
+        Last count
+
+    """
+    output = output or sys.stderr
+    started: float = time.perf_counter()
+    count: int = 0
+
+    for count in counts:
+        if count % every == 0:
+            elapsed: float = time.perf_counter() - started
+            print(
+                f"{count} rows, {count / elapsed:.0f} rows/s",
+                file=output,
+                flush=True
+            )
+
+    elapsed = time.perf_counter() - started
+    print(
+        f"Done: {count} rows in {elapsed:.1f} s, "
+        f"{count / elapsed if elapsed else 0:.0f} rows/s",
+        file=output
+    )
+
+    return count
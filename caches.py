@@ -0,0 +1,319 @@
+""" Server side caches of our wsgi application
+
+Attributes
+----------
+http_cache : MemoryCache
+    Storage for cached responses, used by wheezy.http cache middleware
+page_cache_profile : CacheProfile
+    Server side cache of whole pages for anonymous users. Key includes
+    notes data version, so other processes never serve stale pages
+page_cache_dependency : CacheDependency
+    Wires cached pages to data they are rendered from
+NOTES_DEPENDENCY : str
+    Dependency key of pages that show notes
+user_cache : LRUCache
+    Id and username of users by ("id", id) and ("email", email) keys,
+    password hashes are never cached
+post_cache : LRUCache
+    Posts by id, cleared whenever notes data version changes, entries
+    expire so changes of other processes are seen without version check
+search_cache : LRUCache
+    Search result pages by (notes version, normalized keyword, page)
+title_index : TitleIndex
+    Sorted titles of live posts for prefix suggestions
+"""
+import time
+import threading
+from bisect import bisect_left, insort
+from functools import wraps
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+from wheezy.caching import MemoryCache, CacheDependency
+from wheezy.http import response_cache, CacheProfile
+
+from metrics import registry
+from config import (
+    PAGE_CACHE_DURATION,
+    USER_CACHE_SIZE,
+    USER_CACHE_TTL,
+    POST_CACHE_SIZE,
+    POST_CACHE_TTL,
+    SEARCH_CACHE_SIZE
+)
+
+
+NOTES_DEPENDENCY: str = "notes"
+
+http_cache = MemoryCache()
+
+page_cache_profile = CacheProfile(
+    "server",
+    duration=PAGE_CACHE_DURATION,
+    vary_query=["page", "after", "before"],
+    vary_cookies=["_a"],
+    vary_environ=["NOTES_VERSION"],
+    namespace="pages",
+    enabled=True
+)
+
+page_cache_dependency = CacheDependency(http_cache, namespace="pages")
+
+
+def anonymous_response_cache(
+    profile: CacheProfile,
+    dependency: str | None = None
+):
+    """ Decorator for handler methods, caches responses only for anonymous
+        users. Authenticated users always get fresh page, their requests
+        don't match cached ones because profile varies by auth cookie.
+
+    Parameters
+    ----------
+    profile : CacheProfile
+    dependency : str | None, optional
+        Dependency key that invalidates cached responses
+
+    """
+    def decorate(method):
+        cached_method = response_cache(profile)(method)
+
+        @wraps(method)
+        def wrapper(handler, *args, **kwargs):
+            if handler.principal:
+                return method(handler, *args, **kwargs)
+
+            response = cached_method(handler, *args, **kwargs)
+
+            if dependency:
+                response.cache_dependency.append(dependency)
+
+            return response
+
+        return wrapper
+
+    return decorate
+
+
+class LRUCache:
+    """ Thread-safe in-process LRU cache with optional time to live.
+
+    Parameters
+    ----------
+    max_size : int
+        Max total size of items, least recently used are evicted first
+    ttl : float | None, optional
+        Seconds after which item expires, None means never
+    sizeof : Callable[[Any], int] | None, optional
+        Size of value, by default every item has size 1
+
+    """
+    def __init__(
+        self,
+        max_size: int,
+        ttl: float | None = None,
+        sizeof: Callable[[Any], int] | None = None
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.sizeof = sizeof or (lambda value: 1)
+
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+        self._items: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """ Returns cached value or default if it is missing or expired
+
+        Parameters
+        ----------
+        key : Hashable
+        default : Any, optional
+
+        Returns
+        -------
+        Any
+
+        """
+        with self._lock:
+            if (item := self._items.get(key)) is None or (
+                item[1] is not None and item[1] <= time.monotonic()
+            ):
+                if item:
+                    self._pop(key)
+
+                self.misses += 1
+                return default
+
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """ Puts value to cache, evicts least recently used items
+            that don't fit
+
+        Parameters
+        ----------
+        key : Hashable
+        value : Any
+
+        """
+        size: int = self.sizeof(value)
+        expires = time.monotonic() + self.ttl if self.ttl else None
+
+        with self._lock:
+            self._pop(key)
+
+            if size > self.max_size:
+                return
+
+            self._items[key] = (value, expires, size)
+            self.size += size
+
+            while self.size > self.max_size:
+                self._pop(next(iter(self._items)))
+
+    def delete(self, key: Hashable) -> None:
+        """ Removes value from cache
+
+        Parameters
+        ----------
+        key : Hashable
+
+        """
+        with self._lock:
+            self._pop(key)
+
+    def clear(self) -> None:
+        """ Removes everything from cache
+        """
+        with self._lock:
+            self._items.clear()
+            self.size = 0
+
+    def stats(self) -> dict:
+        """ Returns usage statistics of cache
+
+        Returns
+        -------
+        dict
+            hits, misses, items, size
+
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "items": len(self._items),
+                "size": self.size,
+            }
+
+    def _pop(self, key: Hashable) -> None:
+        if (item := self._items.pop(key, None)) is not None:
+            self.size -= item[2]
+
+
+class TitleIndex:
+    """ Thread-safe in-process sorted index of post titles, finds titles
+        by prefix with binary search. Titles are compared case folded
+        with collapsed whitespace.
+        Keeps position of notes table it has seen, so it can be brought
+        up to date with changes made by other processes. Only sync moves
+        that position, titles put by writes of this process don't, so
+        posts that other processes inserted before them are not skipped.
+    """
+    def __init__(self):
+        self.max_id = 0
+        self.synced = None
+
+        self._entries: list = []
+        self._keys: dict = {}
+        self._lock = threading.Lock()
+
+    def put(self, post_id: int, title: str) -> None:
+        """ Adds title of post or replaces its previous title
+
+        Parameters
+        ----------
+        post_id : int
+        title : str
+
+        """
+        with self._lock:
+            self._remove(post_id)
+
+            key: str = " ".join(title.casefold().split())
+            insort(self._entries, (key, post_id, title))
+            self._keys[post_id] = key
+
+    def remove(self, post_id: int) -> None:
+        """ Removes title of post
+
+        Parameters
+        ----------
+        post_id : int
+
+        """
+        with self._lock:
+            self._remove(post_id)
+
+    def find(self, prefix: str, limit: int) -> list[tuple[int, str]]:
+        """ Finds titles that start with prefix in alphabetical order
+
+        Parameters
+        ----------
+        prefix : str
+            Case folded prefix with collapsed whitespace
+        limit : int
+
+        Returns
+        -------
+        list[tuple[int, str]]
+            Post ids and titles
+
+        """
+        found: list = []
+
+        with self._lock:
+            position: int = bisect_left(self._entries, (prefix,))
+
+            for key, post_id, title in self._entries[
+                position:position + limit
+            ]:
+                if not key.startswith(prefix):
+                    break
+
+                found.append((post_id, title))
+
+        return found
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, post_id: int) -> None:
+        if (key := self._keys.pop(post_id, None)) is not None:
+            position: int = bisect_left(self._entries, (key, post_id))
+            del self._entries[position]
+
+
+user_cache = LRUCache(USER_CACHE_SIZE, USER_CACHE_TTL)
+
+post_cache = LRUCache(POST_CACHE_SIZE, POST_CACHE_TTL)
+
+search_cache = LRUCache(
+    SEARCH_CACHE_SIZE,
+    sizeof=lambda page: sum(
+        len(value) for post in page[0] for value in post.values()
+        if isinstance(value, str)
+    ) + 1
+)
+
+title_index = TitleIndex()
+
+registry.add_collector("user", user_cache.stats)
+registry.add_collector("post", post_cache.stats)
+registry.add_collector("search", search_cache.stats)
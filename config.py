@@ -3,4 +3,113 @@ import os
 Configuration file for all constants that we will use inside project
 Add you'r constants if needed.
 """
-DATA_BASE_PATH = os.path.join("data", "dataBase.sqlite3")
+DATA_BASE_PATH = os.environ.get(
+    "DATA_BASE_PATH", os.path.join("data", "dataBase.sqlite3")
+)
+
+# Connection pool, busy timeout is in milliseconds, negative cache size is
+# in KiB (sqlite3 PRAGMA cache_size semantics).
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 8))
+DB_POOL_TIMEOUT = 10.0
+DB_BUSY_TIMEOUT = 5000
+DB_CACHE_SIZE = int(os.environ.get("DB_CACHE_SIZE", -16000))
+
+# Slow query log, statements that take at least threshold milliseconds are
+# written with their query plan to rotating JSONL file. Empty threshold
+# disables the log.
+SLOW_QUERY_THRESHOLD = float(os.environ.get("SLOW_QUERY_THRESHOLD") or 0)
+SLOW_QUERY_LOG_PATH = os.environ.get(
+    "SLOW_QUERY_LOG_PATH", os.path.join("data", "slow_queries.jsonl")
+)
+SLOW_QUERY_LOG_MAX_BYTES = 10 * 1024 * 1024
+SLOW_QUERY_LOG_BACKUPS = 5
+
+# Group commit of writes, max delay and timeout of caller are in seconds
+DB_WRITE_MAX_BATCH = 64
+DB_WRITE_MAX_DELAY = 0.002
+DB_WRITE_TIMEOUT = 30.0
+
+SEARCH_RESULTS_PER_PAGE = 20
+
+# Maintenance, deleted posts older than retention days are moved to archive
+# in batches of rows, free pages are vacuumed in steps of pages. Pause is
+# in seconds between batches and steps, so requests' writes get the lock.
+ARCHIVE_RETENTION_DAYS = 30
+ARCHIVE_BATCH_SIZE = 200
+VACUUM_STEP_PAGES = 500
+MAINTENANCE_PAUSE = 0.05
+
+# Count of titles given by search suggestions, seconds after which title
+# index is synced with database in background
+SUGGEST_LIMIT = 10
+TITLE_INDEX_MAX_AGE = 2
+
+# Posts per page of "My posts" feed of author
+AUTHOR_POSTS_PER_PAGE = 20
+
+# Characters of body stored as excerpt that is shown in home feed
+EXCERPT_LENGTH = 300
+
+# Notes per page of JSON feed API, default one and max one that clients
+# can ask for with limit argument. Page is read in batches, connection is
+# held only for one batch.
+API_NOTES_LIMIT = 50
+API_NOTES_MAX_LIMIT = 500
+API_NOTES_BATCH_SIZE = 100
+
+# Original static files and their built, content hashed and precompressed
+# copies, see assets.py
+STATIC_PATH = "static"
+ASSETS_PATH = os.environ.get("ASSETS_PATH", os.path.join("build", "static"))
+
+# Compiled templates of production mode, see template_engine.py
+TEMPLATES_PATH = "templates"
+TEMPLATE_CACHE_PATH = os.environ.get(
+    "TEMPLATE_CACHE_PATH", os.path.join("build", "templates")
+)
+
+# Seconds to keep whole pages for anonymous users in server side cache
+PAGE_CACHE_DURATION = 300
+
+# In-process cache of users, size is count of cache keys (every user has
+# id and email key), time to live is in seconds
+USER_CACHE_SIZE = 20000
+USER_CACHE_TTL = 300
+
+# In-process cache of posts, size is count of posts. Time to live in
+# seconds bounds how long change made by other process can stay unseen.
+POST_CACHE_SIZE = 10000
+POST_CACHE_TTL = 5
+
+# In-process cache of search result pages, size is total length of text
+# fields of cached posts in characters
+SEARCH_CACHE_SIZE = 8_000_000
+
+# Max count of posts in one batch read-post request
+READ_POSTS_MAX = 50
+
+# Production server, see server.py. Max requests of 0 disables recycling of
+# workers, keep alive requests limits requests over one connection, timeouts
+# are in seconds.
+SERVER_HOST = os.environ.get("SERVER_HOST", "")
+SERVER_PORT = int(os.environ.get("SERVER_PORT", 8080))
+SERVER_THREADS = int(os.environ.get("SERVER_THREADS", 16))
+SERVER_WORKERS = int(os.environ.get("SERVER_WORKERS", os.cpu_count() or 1))
+SERVER_MAX_REQUESTS = int(os.environ.get("SERVER_MAX_REQUESTS", 10000))
+SERVER_KEEP_ALIVE = 5.0
+SERVER_KEEP_ALIVE_REQUESTS = 100
+SERVER_GRACEFUL_TIMEOUT = 30.0
+
+# ASGI mode, see asgi.py. Requests with bigger bodies get 413, in bytes.
+ASGI_MAX_BODY_SIZE = 1024 * 1024
+
+# Password hashing, method and cost are werkzeug method string parts, e.g.
+# "scrypt" with "32768:8:1" (n:r:p) or "pbkdf2:sha256" with "600000"
+# (iterations). Stored hashes made with other values are rehashed on login.
+PASSWORD_HASH_METHOD = os.environ.get("PASSWORD_HASH_METHOD", "scrypt")
+PASSWORD_HASH_COST = os.environ.get("PASSWORD_HASH_COST", "32768:8:1")
+PASSWORD_HASH_WORKERS = int(
+    os.environ.get("PASSWORD_HASH_WORKERS", os.cpu_count() or 1)
+)
+PASSWORD_HASH_MAX_PENDING = PASSWORD_HASH_WORKERS * 4
+PASSWORD_HASH_TIMEOUT = 2.0
@@ -0,0 +1,196 @@
+import json
+import base64
+import binascii
+from datetime import datetime
+from typing import Iterator
+
+from data_base import CursorContextManager
+from controllers.users_controllers import take_users
+from config import API_NOTES_LIMIT, API_NOTES_MAX_LIMIT, API_NOTES_BATCH_SIZE
+
+
+API_NOTES_QUERY: str = '''
+    SELECT id, author_id, title, body, created
+    FROM notes
+    WHERE deleted = 0 AND id > ? {filters}
+    ORDER BY id
+    LIMIT ?
+'''
+
+
+def define_feed_filters(query: dict) -> dict | str:
+    """ Defines filters of notes feed from query arguments. Cursor carries
+        filters of the first request, so they are taken from it when it
+        is given.
+
+    Parameters
+    ----------
+    query : dict
+        Query arguments of request
+
+    Returns
+    -------
+    dict | str
+        Filters (after, author_id, since, limit) or error message
+
+    """
+    try:
+        limit: int = int(query.get("limit", [API_NOTES_LIMIT])[0])
+    except ValueError:
+        return "Limit must be a number."
+
+    if not 1 <= limit <= API_NOTES_MAX_LIMIT:
+        return f"Limit must be between 1 and {API_NOTES_MAX_LIMIT}."
+
+    if cursor := query.get("cursor", [""])[0]:
+        if not (filters := decode_cursor(cursor)):
+            return "Cursor is invalid."
+
+        return dict(filters, limit=limit)
+
+    filters: dict = {"after": 0, "author_id": None, "since": None}
+
+    if author_id := query.get("author_id", [""])[0]:
+        if not author_id.isdigit():
+            return "Author id must be a number."
+
+        filters["author_id"] = int(author_id)
+
+    if since := query.get("since", [""])[0]:
+        try:
+            filters["since"] = datetime.fromisoformat(since).strftime(
+                "%Y-%m-%d %H:%M"
+            )
+        except ValueError:
+            return "Since must be a date, e.g. 2024-01-31 or 2024-01-31 18:30."
+
+    return dict(filters, limit=limit)
+
+
+def encode_cursor(after: int, author_id: int | None, since: str | None) -> str:
+    """ Makes opaque cursor of next page
+
+    Parameters
+    ----------
+    after : int
+        Id of last note on page
+    author_id : int | None
+    since : str | None
+
+    Returns
+    -------
+    str
+
+    """
+    return base64.urlsafe_b64encode(
+        json.dumps([after, author_id, since], separators=(",", ":")).encode()
+    ).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict | None:
+    """ Reads opaque cursor, returns None if it is invalid
+
+    Parameters
+    ----------
+    cursor : str
+
+    Returns
+    -------
+    dict | None
+        after, author_id, since
+
+    """
+    try:
+        after, author_id, since = json.loads(
+            base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        )
+    except (ValueError, TypeError, binascii.Error):
+        return None
+
+    if not isinstance(after, int) or not (
+        author_id is None or isinstance(author_id, int)
+    ) or not (since is None or isinstance(since, str)):
+        return None
+
+    return {"after": after, "author_id": author_id, "since": since}
+
+
+def stream_notes(
+    after: int,
+    limit: int,
+    author_id: int | None = None,
+    since: str | None = None
+) -> Iterator[bytes]:
+    """ Streams page of notes with names of authors as JSON document.
+        Rows are read in batches of API_NOTES_BATCH_SIZE, pooled connection
+        is released before batch is sent, so slow clients don't hold it.
+
+    Parameters
+    ----------
+    after : int
+        Id of last note of previous page, 0 for first page
+    limit : int
+        Count of notes on page
+    author_id : int | None, optional
+        Only notes of this author
+    since : str | None, optional
+        Only notes created at this time or later
+
+    Yields
+    ------
+    bytes
+        Parts of {"notes": [...], "next_cursor": str | null}
+
+    """
+    filters: str = ""
+    params: list = []
+
+    if author_id is not None:
+        filters += " AND author_id = ?"
+        params.append(author_id)
+
+    if since is not None:
+        filters += " AND created >= ?"
+        params.append(since)
+
+    yield b'{"notes":['
+
+    next_cursor: str | None = None
+    last_id: int = after
+    position: int = 0
+
+    while next_cursor is None:
+        # One row more than limit tells that there is next page
+        size: int = min(limit + 1 - position, API_NOTES_BATCH_SIZE)
+
+        with CursorContextManager() as cursor:
+            notes: list = cursor.execute(
+                API_NOTES_QUERY.format(filters=filters),
+                (last_id, *params, size)
+            ).fetchall()
+
+        authors: dict = take_users({note["author_id"] for note in notes})
+
+        for note in notes:
+            if position == limit:
+                next_cursor = encode_cursor(last_id, author_id, since)
+                break
+
+            last_id = note["id"]
+            author: dict | None = authors.get(note["author_id"])
+
+            yield (b"," if position else b"") + json.dumps({
+                "id": note["id"],
+                "title": note["title"],
+                "body": note["body"],
+                "created": note["created"],
+                "author_id": note["author_id"],
+                "author": author and author["username"],
+            }).encode()
+
+            position += 1
+
+        if len(notes) < size:
+            break
+
+    yield f'],"next_cursor":{json.dumps(next_cursor)}}}'.encode()
@@ -0,0 +1,130 @@
+import time
+import threading
+
+from caches import (
+    page_cache_dependency,
+    post_cache,
+    search_cache,
+    title_index,
+    NOTES_DEPENDENCY
+)
+from data_base import CursorContextManager
+from config import TITLE_INDEX_MAX_AGE
+
+
+_seen_notes_version: list = [None]
+_seen_notes_version_lock = threading.Lock()
+_title_index_lock = threading.Lock()
+_title_index_refresh_lock = threading.Lock()
+
+
+def take_notes_version() -> int:
+    """ Takes version of notes data, triggers in database increase it on
+        every change of notes table.
+
+    Returns
+    -------
+    int
+
+    """
+    with CursorContextManager() as cursor:
+        return cursor.execute(
+            "SELECT version FROM data_versions WHERE name = 'notes'"
+        ).fetchone()[0]
+
+
+def invalidate_pages() -> None:
+    """ Deletes cached pages that show notes
+    """
+    page_cache_dependency.delete(NOTES_DEPENDENCY)
+
+
+def sync_notes_version(version: int) -> None:
+    """ Clears post and search caches and catches up title index when
+        notes were changed since last seen version, this way changes made
+        by other processes are never served from cache of this one.
+
+    Parameters
+    ----------
+    version : int
+        Current notes data version
+
+    """
+    with _seen_notes_version_lock:
+        if _seen_notes_version[0] == version:
+            return
+
+        _seen_notes_version[0] = version
+
+    post_cache.clear()
+    search_cache.clear()
+    sync_title_index()
+
+
+def sync_title_index() -> int:
+    """ Loads titles of live posts into title index first time, later
+        applies only posts that were created, changed or deleted since
+        previous sync.
+
+    Returns
+    -------
+    int
+        Count of applied posts
+
+    """
+    with _title_index_lock:
+        started: int = int(time.time())
+
+        with CursorContextManager() as cursor:
+            if title_index.synced is None:
+                changed: list = cursor.execute(
+                    'SELECT id, title, deleted FROM notes WHERE deleted = 0'
+                ).fetchall()
+            else:
+                changed = cursor.execute(
+                    '''
+                    SELECT id, title, deleted FROM notes
+                    WHERE id > ? OR updated >= ?
+                    ''',
+                    (title_index.max_id, title_index.synced)
+                ).fetchall()
+
+        for post in changed:
+            if post["deleted"]:
+                title_index.remove(post["id"])
+            else:
+                title_index.put(post["id"], post["title"])
+
+            title_index.max_id = max(title_index.max_id, post["id"])
+
+        title_index.synced = started
+
+    return len(changed)
+
+
+def refresh_title_index(max_age: float = TITLE_INDEX_MAX_AGE) -> None:
+    """ Starts sync of title index in background thread when index is
+        older than max_age seconds. Caller never waits for database, at
+        most one sync runs at a time.
+
+    Parameters
+    ----------
+    max_age : float, optional
+        Seconds since last sync
+
+    """
+    if title_index.synced is not None and (
+        time.time() - title_index.synced < max_age
+    ):
+        return
+
+    if not _title_index_refresh_lock.acquire(blocking=False):
+        return
+
+    def run() -> None:
+        try:
+            sync_title_index()
+        finally:
+            _title_index_refresh_lock.release()
+
+    threading.Thread(target=run, name="title-index-sync", daemon=True).start()
@@ -0,0 +1,147 @@
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from metrics import timed
+from config import (
+    PASSWORD_HASH_METHOD,
+    PASSWORD_HASH_COST,
+    PASSWORD_HASH_WORKERS,
+    PASSWORD_HASH_MAX_PENDING,
+    PASSWORD_HASH_TIMEOUT
+)
+
+
+class HasherBusyError(Exception):
+    """ Raised when too many passwords are waiting for hashing
+    """
+
+
+class PasswordHasher:
+    """ Hashes and verifies passwords on a bounded process pool, so slow
+        CPU bound hashing doesn't hold GIL of request threads.
+
+    Parameters
+    ----------
+    workers : int
+        Count of hashing processes
+    max_pending : int
+        Max count of passwords that are hashed or wait for it
+    timeout : float
+        Seconds to wait for free place in queue before rejecting work
+
+    """
+    def __init__(
+        self,
+        workers: int = PASSWORD_HASH_WORKERS,
+        max_pending: int = PASSWORD_HASH_MAX_PENDING,
+        timeout: float = PASSWORD_HASH_TIMEOUT
+    ):
+        self.workers = workers
+        self.timeout = timeout
+
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._pid: int | None = None
+
+    def hash(self, password: str) -> str:
+        """ Hashes password with configured method and cost
+
+        Parameters
+        ----------
+        password : str
+
+        Returns
+        -------
+        str
+
+        """
+        return self._run(
+            generate_password_hash,
+            password,
+            f"{PASSWORD_HASH_METHOD}:{PASSWORD_HASH_COST}"
+        )
+
+    def verify(self, password_hash: str, password: str) -> bool:
+        """ Checks password against its hash
+
+        Parameters
+        ----------
+        password_hash : str
+        password : str
+
+        Returns
+        -------
+        bool
+
+        """
+        return self._run(check_password_hash, password_hash, password)
+
+    def close(self) -> None:
+        """ Stops hashing processes of current process
+        """
+        with self._lock:
+            if self._pid == os.getpid():
+                self._executor.shutdown()
+                self._pid = None
+
+    def _run(self, func, *args):
+        """ Runs func inside hashing process and waits for result
+
+        Raises
+        ------
+        HasherBusyError
+            If queue stays full during timeout
+
+        """
+        if not self._slots.acquire(timeout=self.timeout):
+            raise HasherBusyError("Too many passwords are waiting for hash.")
+
+        try:
+            with timed("hashing_seconds"):
+                return self._start().submit(func, *args).result()
+        finally:
+            self._slots.release()
+
+    def _start(self) -> ProcessPoolExecutor:
+        """ Starts process pool on first use, forked server worker starts
+            its own one. Processes are spawned, forking of threaded process
+            isn't safe.
+
+        Returns
+        -------
+        ProcessPoolExecutor
+
+        """
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._executor = ProcessPoolExecutor(
+                    self.workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+
+        return self._executor
+
+
+def needs_rehash(password_hash: str) -> bool:
+    """ Checks if hash was made with outdated method or cost
+
+    Parameters
+    ----------
+    password_hash : str
+
+    Returns
+    -------
+    bool
+
+    """
+    return password_hash.split("$", 1)[0] != (
+        f"{PASSWORD_HASH_METHOD}:{PASSWORD_HASH_COST}"
+    )
+
+
+hasher = PasswordHasher()
@@ -1,6 +1,10 @@
 from datetime import datetime
+from email.utils import formatdate
 
-from data_base import db, CursorContextManager
+from caches import post_cache, title_index
+from config import EXCERPT_LENGTH
+from data_base import CursorContextManager, writer
+from controllers.cache_controllers import invalidate_pages
 
 
 def validate_post(
@@ -15,14 +19,7 @@ def validate_post(
     user_session : None | dict, optional
 
     """
-    with CursorContextManager(db) as cursor:
-
-        current_post: dict = cursor.execute(
-            'SELECT * FROM notes WHERE id = ?',
-            (post_id,)
-        ).fetchone()
-
-    if not current_post:
+    if not (current_post := take_post(int(post_id))):
         return
 
     if user_session and str(
@@ -32,6 +29,142 @@ def validate_post(
     return current_post
 
 
+def take_post(post_id: int) -> dict | None:
+    """ Takes post by id from post cache or database
+
+    Parameters
+    ----------
+    post_id : int
+
+    Returns
+    -------
+    dict | None
+
+    """
+    if current_post := post_cache.get(post_id):
+        return current_post
+
+    with CursorContextManager() as cursor:
+        current_post = cursor.execute(
+            'SELECT * FROM notes WHERE id = ?',
+            (post_id,)
+        ).fetchone()
+
+    if current_post:
+        post_cache.set(post_id, current_post := dict(current_post))
+
+    return current_post
+
+
+def take_posts(post_ids: list[int]) -> dict:
+    """ Takes many live posts by ids, those that are missing in post cache
+        are taken from database by single query.
+
+    Parameters
+    ----------
+    post_ids : list[int]
+
+    Returns
+    -------
+    dict
+        Posts by their ids, ids that don't exist or are deleted are skipped
+
+    """
+    posts: dict = {}
+
+    for post_id in post_ids:
+        if current_post := post_cache.get(post_id):
+            posts[post_id] = current_post
+
+    if missing := [post_id for post_id in post_ids if post_id not in posts]:
+        with CursorContextManager() as cursor:
+            for current_post in cursor.execute(
+                'SELECT * FROM notes '
+                f'WHERE id IN ({", ".join("?" * len(missing))})',
+                missing
+            ):
+                post_cache.set(
+                    current_post["id"], current_post := dict(current_post)
+                )
+                posts[current_post["id"]] = current_post
+
+    return {
+        post_id: current_post for post_id, current_post in posts.items()
+        if not current_post["deleted"]
+    }
+
+
+def define_post_ids(ids: str, max_count: int) -> list[int] | None:
+    """ Parses comma separated post ids of batch request
+
+    Parameters
+    ----------
+    ids : str
+        E.g. "1,2,3"
+    max_count : int
+        Max count of ids in one request
+
+    Returns
+    -------
+    list[int] | None
+        Unique ids in given order or None if they are invalid
+
+    """
+    post_ids: list = [post_id for post_id in ids.split(",") if post_id]
+
+    if not post_ids or len(post_ids) > max_count or not all(
+        post_id.isdigit() for post_id in post_ids
+    ):
+        return None
+
+    return list(dict.fromkeys(map(int, post_ids)))
+
+
+def define_post_validators(post: dict) -> tuple[str, str]:
+    """ Defines ETag and Last-Modified header values of post
+
+    Parameters
+    ----------
+    post : dict
+
+    Returns
+    -------
+    tuple[str, str]
+        ETag, Last-Modified
+
+    """
+    modified: float = post["updated"] or datetime.strptime(
+        post["created"], "%Y-%m-%d %H:%M"
+    ).timestamp()
+
+    return (
+        f'"{post["id"]}-{post["version"]}"',
+        formatdate(modified, usegmt=True)
+    )
+
+
+def define_excerpt(body: str | None) -> dict:
+    """ Defines values of columns that describe body without it: excerpt,
+        body_length and has_body
+
+    Parameters
+    ----------
+    body : str | None
+
+    Returns
+    -------
+    dict
+
+    """
+    body = body or ""
+
+    return {
+        "excerpt": body[:EXCERPT_LENGTH],
+        "body_length": len(body),
+        "has_body": int(bool(body)),
+    }
+
+
 def delete_post(post_id: str):
     """ Deletes post from database
 
@@ -40,10 +173,16 @@ def delete_post(post_id: str):
     post_id : str
 
     """
-    with CursorContextManager(db) as cursor:
-        cursor.execute('UPDATE notes SET deleted = 1 WHERE id = ?', (post_id,))
+    writer.execute(
+        lambda cursor: cursor.execute(
+            'UPDATE notes SET deleted = 1 WHERE id = ?',
+            (post_id,)
+        )
+    )
 
-    db.commit()
+    post_cache.delete(int(post_id))
+    title_index.remove(int(post_id))
+    invalidate_pages()
 
 
 def update_post(
@@ -65,13 +204,22 @@ def update_post(
     if not title:
         return "Title is required."
 
-    with CursorContextManager(db) as cursor:
-        cursor.execute(
-            'UPDATE notes SET title = ?, body= ? WHERE id = ?',
-            (title, body, post_id)
+    writer.execute(
+        lambda cursor: cursor.execute(
+            '''UPDATE notes SET
+                title = :title,
+                body = :body,
+                excerpt = :excerpt,
+                body_length = :body_length,
+                has_body = :has_body
+            WHERE id = :id''',
+            dict(define_excerpt(body), title=title, body=body, id=post_id)
         )
+    )
 
-    db.commit()
+    post_cache.delete(int(post_id))
+    title_index.put(int(post_id), title)
+    invalidate_pages()
 
 
 def create_post(
@@ -91,21 +239,35 @@ def create_post(
         body for new post
 
     """
-    with CursorContextManager(db) as cursor:
-        cursor.execute(
+    post_id: int = writer.execute(
+        lambda cursor: cursor.execute(
             '''INSERT INTO notes (
                 title,
                 body,
                 created,
-                author_id
+                author_id,
+                excerpt,
+                body_length,
+                has_body
             )
-            VALUES (?, ?, ?, ?)''',
-            (
-                title,
-                body,
-                datetime.now().strftime("%Y-%m-%d %H:%M"),
-                int(user_session['user_id'])
+            VALUES (
+                :title,
+                :body,
+                :created,
+                :author_id,
+                :excerpt,
+                :body_length,
+                :has_body
+            )''',
+            dict(
+                define_excerpt(body),
+                title=title,
+                body=body,
+                created=datetime.now().strftime("%Y-%m-%d %H:%M"),
+                author_id=int(user_session['user_id'])
             )
-        )
+        ).lastrowid
+    )
 
-    db.commit()
+    title_index.put(post_id, title)
+    invalidate_pages()
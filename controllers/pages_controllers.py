@@ -1,13 +1,49 @@
-from data_base import db, CursorContextManager
+from config import AUTHOR_POSTS_PER_PAGE
+from data_base import CursorContextManager
+from controllers.users_controllers import take_users
 
 
-def init_pages(page: int) -> tuple[list, int]:
-    """Summary
+POSTS_PER_PAGE: int = 2
+
+FEED_QUERY: str = '''
+    SELECT notes.id, notes.author_id, notes.title, notes.created,
+    notes.excerpt, notes.body_length, notes.has_body
+    FROM notes
+    WHERE deleted = 0 {keyset}
+    ORDER BY notes.id {order}
+    LIMIT ? {offset}
+'''
+
+AUTHOR_FEED_QUERY: str = '''
+    SELECT id, author_id, title, created, excerpt, body_length, has_body
+    FROM notes
+    WHERE author_id = ? AND deleted = 0 {keyset}
+    ORDER BY id DESC
+    LIMIT ?
+'''
+
+
+def init_pages(
+    page: int,
+    after: int | None = None,
+    before: int | None = None
+) -> tuple[list, int]:
+    """ Takes posts for current page. When cursor is given (id of last post
+        from previous page or first post from next page) uses keyset
+        pagination, so any page costs same as first one. Otherwise falls
+        back to offset pagination by page number. Posts have excerpts
+        instead of bodies, they are read from covering index. Count of
+        pages comes from live posts counter. Names of creators come from
+        user cache.
 
     Parameters
     ----------
     page : int
         Current page for user
+    after : int | None, optional
+        Id of last post on previous page
+    before : int | None, optional
+        Id of first post on next page
 
     Returns
     -------
@@ -15,31 +51,115 @@ def init_pages(page: int) -> tuple[list, int]:
         items_on_page, total_pages
 
     """
-    with CursorContextManager(db) as cursor:
-
-        limit: int = 2
-        offset: int = (page - 1) * limit
-
-        items_on_page: list = cursor.execute(
-            '''
-            SELECT notes.id, notes.author_id, notes.title, notes.body,
-            notes.created, users.username as creator
-            FROM notes INNER JOIN users ON notes.author_id = users.id
-            WHERE deleted = 0
-            LIMIT ? OFFSET ?
-            ''',
-            (limit, offset)
-        ).fetchall()
-
-        posts_count: int = len(
-            [post for post in cursor.execute('SELECT id FROM notes')]
+    with CursorContextManager() as cursor:
+
+        limit: int = POSTS_PER_PAGE
+
+        if after is not None:
+            items_on_page: list = cursor.execute(
+                FEED_QUERY.format(
+                    keyset="AND notes.id > ?", order="ASC", offset=""
+                ),
+                (after, limit)
+            ).fetchall()
+        elif before is not None:
+            items_on_page: list = cursor.execute(
+                FEED_QUERY.format(
+                    keyset="AND notes.id < ?", order="DESC", offset=""
+                ),
+                (before, limit)
+            ).fetchall()[::-1]
+        else:
+            offset: int = (page - 1) * limit
+
+            items_on_page: list = cursor.execute(
+                FEED_QUERY.format(keyset="", order="ASC", offset="OFFSET ?"),
+                (limit, offset)
+            ).fetchall()
+
+    # Empty feed still has its first page
+    total_pages: int = max(1, -(-count_live_posts() // limit))
+
+    creators: dict = take_users({post["author_id"] for post in items_on_page})
+
+    # Posts of users that don't exist are skipped, same as inner join does
+    items_on_page = [
+        dict(
+            post,
+            creator=creators[post["author_id"]]["username"],
+            truncated=post["body_length"] > len(post["excerpt"])
         )
-        total_pages = ((posts_count + limit - 1) // limit) - 1 if posts_count \
-            else 1
+        for post in items_on_page
+        if post["author_id"] in creators
+    ]
 
     return items_on_page, total_pages
 
 
+def init_author_pages(
+    author_id: int,
+    before: int | None = None
+) -> tuple[list, int | None]:
+    """ Takes page of live posts of author, newest first. Keyset pagination
+        by index on (author_id, deleted, id) reads only rows of the page.
+
+    Parameters
+    ----------
+    author_id : int
+    before : int | None, optional
+        Id of last post on previous page
+
+    Returns
+    -------
+    tuple[list, int | None]
+        items_on_page, cursor of next page or None if it is the last one
+
+    """
+    limit: int = AUTHOR_POSTS_PER_PAGE
+
+    with CursorContextManager() as cursor:
+        if before is not None:
+            items_on_page: list = cursor.execute(
+                AUTHOR_FEED_QUERY.format(keyset="AND id < ?"),
+                (author_id, before, limit + 1)
+            ).fetchall()
+        else:
+            items_on_page = cursor.execute(
+                AUTHOR_FEED_QUERY.format(keyset=""),
+                (author_id, limit + 1)
+            ).fetchall()
+
+    next_cursor: int | None = items_on_page[limit - 1]["id"] \
+        if len(items_on_page) > limit else None
+
+    return [
+        dict(post, truncated=post["body_length"] > len(post["excerpt"]))
+        for post in items_on_page[:limit]
+    ], next_cursor
+
+
+def count_live_posts(author_id: int = 0) -> int:
+    """ Takes count of live posts from counters that triggers keep
+
+    Parameters
+    ----------
+    author_id : int, optional
+        Author of posts, 0 counts posts of everyone
+
+    Returns
+    -------
+    int
+
+    """
+    with CursorContextManager() as cursor:
+        counter = cursor.execute(
+            'SELECT live FROM post_counters WHERE author_id = ?',
+            (author_id,)
+        ).fetchone()
+
+    return counter["live"] if counter else 0
+
+
 def define_current_page(query: dict) -> int:
     """ Validation for query string inside url. If it fails it returns 0
 
@@ -58,3 +178,32 @@ def define_current_page(query: dict) -> int:
         return page if page < 10000 else 0
     except ValueError:
         return 0
+
+
+def define_cursor(query: dict) -> tuple[int | None, int | None] | None:
+    """ Validation for after/before cursors inside query string.
+        If it fails it returns None
+
+    Parameters
+    ----------
+    query : dict
+        Query string from user request
+
+    Returns
+    -------
+    tuple[int | None, int | None] | None
+        after, before
+
+    """
+    try:
+        after, before = (
+            int(query[key][0]) if key in query else None
+            for key in ("after", "before")
+        )
+    except ValueError:
+        return
+
+    if after is not None and before is not None:
+        return
+
+    return after, before
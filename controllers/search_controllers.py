@@ -1,28 +1,224 @@
-from data_base import db, CursorContextManager
+import re
+import sqlite3
 
+from wheezy.html.utils import html_escape
 
-def search_by_title_or_body(keyword: str) -> enumerate:
-    """ Searches inside notes table from database, takes everything by
-        keyword, returns it as enumerated list
+from caches import search_cache, title_index
+from config import SEARCH_RESULTS_PER_PAGE, SUGGEST_LIMIT
+from data_base import CursorContextManager
+from controllers.cache_controllers import (
+    take_notes_version,
+    sync_notes_version,
+    refresh_title_index
+)
+
+
+# Private use characters that mark highlighted words inside snippet. They are
+# replaced by tags only after escaping, so snippet text can't inject html.
+MARK_START: str = "\ue000"
+MARK_END: str = "\ue001"
+
+
+def search_by_title_or_body(
+    keyword: str,
+    page: int = 1
+) -> tuple[enumerate, bool]:
+    """ Searches inside notes table from database by keyword using FTS5
+        index, falls back to LIKE search if index isn't available.
+        Results are ranked, paginated and have highlighted snippets.
+        Pages are cached by normalized keyword and notes data version,
+        so any change of notes makes cached pages unreachable.
 
     Parameters
     ----------
     keyword : str
         keyword from user input
+    page : int, optional
+        Page of search results
+
+    Returns
+    -------
+    tuple[enumerate, bool]
+        enumerated list of search result, is there next page
+
+    """
+    offset: int = (page - 1) * SEARCH_RESULTS_PER_PAGE
+
+    if not (keyword := normalize_keyword(keyword)):
+        return enumerate([], start=1), False
+
+    sync_notes_version(version := take_notes_version())
+    key: tuple = (version, keyword, page)
+
+    if (cached := search_cache.get(key)) is None:
+        cached = find_posts(keyword, offset)
+        search_cache.set(key, cached)
+
+    search_result, has_next = cached
+
+    return enumerate(search_result, start=offset + 1), has_next
+
+
+def find_posts(keyword: str, offset: int) -> tuple[list, bool]:
+    """ Takes page of search results from database
+
+    Parameters
+    ----------
+    keyword : str
+        Normalized keyword
+    offset : int
 
     Returns
     -------
-    enumerate
-        enumerated list of search result
+    tuple[list, bool]
+        Posts with highlighted snippets, is there next page
 
     """
-    with CursorContextManager(db) as cursor:
-        search_result = cursor.execute(
+    limit: int = SEARCH_RESULTS_PER_PAGE
+
+    if not (match_query := build_match_query(keyword)):
+        return [], False
+
+    try:
+        with CursorContextManager() as cursor:
+            search_result: list = cursor.execute(
+                '''
+                SELECT notes.id, notes.author_id, notes.title, notes.has_body,
+                notes.created,
+                snippet(notes_fts, -1, ?1, ?2, '...', 24) as snippet
+                FROM notes_fts INNER JOIN notes ON notes.id = notes_fts.rowid
+                WHERE notes_fts MATCH ?3 AND notes.deleted = 0
+                ORDER BY bm25(notes_fts, 10.0, 1.0)
+                LIMIT ?4 OFFSET ?5
+                ''',
+                (MARK_START, MARK_END, match_query, limit + 1, offset)
+            ).fetchall()
+    except sqlite3.OperationalError:
+        search_result = like_search(keyword, limit + 1, offset)
+
+    return [
+        dict(post, snippet=highlight_snippet(post["snippet"]))
+        for post in search_result[:limit]
+    ], len(search_result) > limit
+
+
+def like_search(keyword: str, limit: int, offset: int) -> list:
+    """ Fallback search by LIKE for sqlite3 builds without FTS5.
+        Snippet is beginning of body with marked keyword.
+
+    Parameters
+    ----------
+    keyword : str
+    limit : int
+    offset : int
+
+    Returns
+    -------
+    list
+
+    """
+    with CursorContextManager() as cursor:
+        search_result: list = cursor.execute(
             '''
-            SELECT * FROM notes WHERE (title LIKE ?1 OR body LIKE ?1)
+            SELECT id, author_id, title, has_body, created,
+            SUBSTR(body, 1, 200) as snippet
+            FROM notes WHERE (title LIKE ?1 OR body LIKE ?1)
             AND deleted = 0
+            ORDER BY id
+            LIMIT ?2 OFFSET ?3
             ''',
-            (f"%{keyword}%",)
+            (f"%{keyword}%", limit, offset)
         ).fetchall()
 
-    return enumerate(search_result, start=1)
\ No newline at end of file
+    pattern = re.compile(re.escape(keyword.strip()), re.IGNORECASE)
+
+    return [
+        dict(
+            post,
+            snippet=pattern.sub(
+                lambda found: f"{MARK_START}{found[0]}{MARK_END}",
+                post["snippet"] or ""
+            )
+        )
+        for post in search_result
+    ]
+
+
+def suggest_titles(query: str, limit: int = SUGGEST_LIMIT) -> list[dict]:
+    """ Finds titles of live posts that start with query in in-process
+        title index, database isn't used. Stale index is synced in
+        background, so changes of other processes show up with next
+        requests.
+
+    Parameters
+    ----------
+    query : str
+        Beginning of title from user input
+    limit : int, optional
+
+    Returns
+    -------
+    list[dict]
+        Ids and titles of posts in alphabetical order
+
+    """
+    refresh_title_index()
+
+    if not (prefix := normalize_keyword(query)):
+        return []
+
+    return [
+        {"id": post_id, "title": title}
+        for post_id, title in title_index.find(prefix, limit)
+    ]
+
+
+def normalize_keyword(keyword: str) -> str:
+    """ Case folds keyword, trims and collapses whitespace, so equal
+        searches share one cache entry
+
+    Parameters
+    ----------
+    keyword : str
+
+    Returns
+    -------
+    str
+
+    """
+    return " ".join(keyword.casefold().split())
+
+
+def build_match_query(keyword: str) -> str:
+    """ Makes FTS5 MATCH query from user input. Every word is quoted, so
+        FTS5 syntax characters are matched literally, and used as prefix.
+
+    Parameters
+    ----------
+    keyword : str
+
+    Returns
+    -------
+    str
+
+    """
+    return " ".join(
+        '"{}"*'.format(word.replace('"', '""')) for word in keyword.split()
+    )
+
+
+def highlight_snippet(snippet: str | None) -> str:
+    """ Escapes snippet then turns markers into <mark> tags
+
+    Parameters
+    ----------
+    snippet : str | None
+
+    Returns
+    -------
+    str
+
+    """
+    return html_escape(snippet or "").replace(
+        MARK_START, "<mark>"
+    ).replace(MARK_END, "</mark>")
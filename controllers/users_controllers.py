@@ -3,9 +3,14 @@ from string import ascii_lowercase, ascii_uppercase, digits
 
 from wheezy.security import Principal
 from wheezy.core.collections import first_item_adapter
-from werkzeug.security import generate_password_hash, check_password_hash
 
-from data_base import db, CursorContextManager
+from caches import user_cache
+from data_base import CursorContextManager, writer
+from controllers.hashing_controllers import (
+    hasher,
+    needs_rehash,
+    HasherBusyError
+)
 
 
 def define_session(principal: Principal) -> dict | None:
@@ -21,15 +26,18 @@ def define_session(principal: Principal) -> dict | None:
     dict
 
     """
-    if principal and (usr_id := principal.id):
+    if principal and (usr_id := principal.id) and (
+        user := take_user(int(usr_id))
+    ):
         return {
             "user_id": usr_id,
-            "username": principal.alias
+            "username": user["username"]
         }
 
 
 def take_login_info(email: str) -> tuple:
-    """ Takes user info from database by email, returns it as tuple
+    """ Takes user info by email, returns it as tuple. After validate_login
+        it comes from user cache, so login costs single query.
 
     Parameters
     ----------
@@ -41,38 +49,195 @@ def take_login_info(email: str) -> tuple:
     tuple
 
     """
-    with CursorContextManager(db) as cursor:
-        cursor.execute(
+    user: dict = take_user_by_email(email)
+
+    return user["id"], user["username"]
+
+
+def take_user(user_id: int) -> dict | None:
+    """ Takes id and username of user by id from user cache or database
+
+    Parameters
+    ----------
+    user_id : int
+
+    Returns
+    -------
+    dict | None
+
+    """
+    if user := user_cache.get(("id", user_id)):
+        return user
+
+    with CursorContextManager() as cursor:
+        user = cursor.execute(
+            'SELECT id, username FROM users WHERE id = ?',
+            (user_id,)
+        ).fetchone()
+
+    return user and cache_user(user)
+
+
+def take_user_by_email(email: str) -> dict | None:
+    """ Takes id and username of user by email from user cache or database
+
+    Parameters
+    ----------
+    email : str
+
+    Returns
+    -------
+    dict | None
+
+    """
+    if user := user_cache.get(("email", email)):
+        return user
+
+    with CursorContextManager() as cursor:
+        user = cursor.execute(
             'SELECT id, username FROM users WHERE email = ?',
             (email,)
+        ).fetchone()
+
+    return user and cache_user(user, email)
+
+
+def take_credentials(email: str) -> dict | None:
+    """ Takes user with password hash by email, always from database.
+        Password hashes are never cached, id and username are put to user
+        cache for take_login_info.
+
+    Parameters
+    ----------
+    email : str
+
+    Returns
+    -------
+    dict | None
+
+    """
+    with CursorContextManager() as cursor:
+        user = cursor.execute(
+            'SELECT id, username, password FROM users WHERE email = ?',
+            (email,)
+        ).fetchone()
+
+    if user:
+        user = dict(user)
+        cache_user(
+            {"id": user["id"], "username": user["username"]},
+            email
         )
-        info = cursor.fetchone()
 
-    return info
+    return user
+
 
+def take_users(user_ids: set) -> dict:
+    """ Takes many users by ids, those that are missing in user cache
+        are taken from database by single query.
 
-def reg_new_acc(request_form: dict) -> None:
+    Parameters
+    ----------
+    user_ids : set
+
+    Returns
+    -------
+    dict
+        Users by their ids, ids that don't exist are skipped
+
+    """
+    users: dict = {}
+
+    for user_id in user_ids:
+        if user := user_cache.get(("id", user_id)):
+            users[user_id] = user
+
+    if missing := [user_id for user_id in user_ids if user_id not in users]:
+        with CursorContextManager() as cursor:
+            for user in cursor.execute(
+                'SELECT id, username FROM users '
+                f'WHERE id IN ({", ".join("?" * len(missing))})',
+                missing
+            ):
+                users[user["id"]] = cache_user(user)
+
+    return users
+
+
+def cache_user(user, email: str | None = None) -> dict:
+    """ Puts id and username of user to user cache by id key, and by email
+        key when email is given
+
+    Parameters
+    ----------
+    user : sqlite3.Row | dict
+    email : str | None, optional
+
+    Returns
+    -------
+    dict
+
+    """
+    user = dict(user)
+
+    user_cache.set(("id", user["id"]), user)
+
+    if email is not None:
+        user_cache.set(("email", email), user)
+
+    return user
+
+
+def invalidate_user(
+    user_id: int | None = None,
+    email: str | None = None
+) -> None:
+    """ Removes user from user cache, must be called after every change
+        of email or username.
+
+    Parameters
+    ----------
+    user_id : int | None, optional
+    email : str | None, optional
+
+    """
+    user_cache.delete(("id", user_id))
+    user_cache.delete(("email", email))
+
+
+def reg_new_acc(request_form: dict) -> str | None:
     """ Writes new account data into database.
 
     Parameters
     ----------
     request_form : dict
 
+    Returns
+    -------
+    str | None
+        Error if password couldn't be hashed now
+
     """
     adapted_form = first_item_adapter(request_form)
 
-    with CursorContextManager(db) as cursor:
-        cursor.execute(
+    try:
+        password_hash: str = hasher.hash(adapted_form["password"])
+    except HasherBusyError:
+        return "Server is busy, please try again later."
+
+    writer.execute(
+        lambda cursor: cursor.execute(
             '''INSERT INTO users (email, phone_number, username, password)
             VALUES (?, ?, ?, ?)''',
             (
                 adapted_form["email"],
                 adapted_form["phone_number"],
                 adapted_form["username"],
-                generate_password_hash(adapted_form["password"])
+                password_hash
             )
         )
-    db.commit()
+    )
+    invalidate_user(email=adapted_form["email"])
 
 
 def validate_login(request_form: dict) -> str | None:
@@ -88,25 +253,42 @@ def validate_login(request_form: dict) -> str | None:
     str | None
 
     """
-    error: str | None = None
     adapted_form = first_item_adapter(request_form)
 
     email: str = adapted_form["email"]
+    password: str = adapted_form["password"]
     text: str = "User with that email not found or Incorrect password"
 
-    with CursorContextManager(db) as cursor:
-        if not (
-            password_hash := cursor.execute(
-                'SELECT password FROM users WHERE email = ?',
-                (email,)
-            ).fetchone()[0]
-        ) or not check_password_hash(
-            password_hash,
-            adapted_form["password"]
-        ):
-            error = text
+    user: dict | None = take_credentials(email)
+
+    try:
+        if not user or not hasher.verify(user["password"], password):
+            return text
 
-    return error
+        if needs_rehash(user["password"]):
+            rehash_password(user["id"], password)
+    except HasherBusyError:
+        return "Server is busy, please try again later."
+
+
+def rehash_password(user_id: int, password: str) -> None:
+    """ Replaces outdated password hash by hash with current method and cost
+
+    Parameters
+    ----------
+    user_id : int
+    password : str
+        Password that is already verified
+
+    """
+    password_hash: str = hasher.hash(password)
+
+    writer.execute(
+        lambda cursor: cursor.execute(
+            'UPDATE users SET password = ? WHERE id = ?',
+            (password_hash, user_id)
+        )
+    )
 
 
 def validate_registration(request_form: dict) -> str | None:
@@ -123,7 +305,7 @@ def validate_registration(request_form: dict) -> str | None:
         Error from validation
 
     """
-    with CursorContextManager(db) as cursor:
+    with CursorContextManager() as cursor:
         adapted_form = first_item_adapter(request_form)
 
         if cursor.execute(
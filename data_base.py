@@ -1,62 +1,1061 @@
-""" Creates connection with database for our wsgi application, handles table
+""" Creates connections with database for our wsgi application, handles table
     creating processes for our db.
 """
+import os
+import sys
+import json
+import time
+import queue
 import sqlite3
+import logging
+import threading
+from typing import Any, Callable
+from logging.handlers import RotatingFileHandler
+from concurrent.futures import (
+    Future,
+    InvalidStateError,
+    TimeoutError as FutureTimeoutError
+)
 
-from config import DATA_BASE_PATH
+from metrics import record, timed
+from config import (
+    DATA_BASE_PATH,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUT,
+    DB_BUSY_TIMEOUT,
+    DB_CACHE_SIZE,
+    DB_WRITE_MAX_BATCH,
+    DB_WRITE_MAX_DELAY,
+    DB_WRITE_TIMEOUT,
+    SLOW_QUERY_THRESHOLD,
+    SLOW_QUERY_LOG_PATH,
+    SLOW_QUERY_LOG_MAX_BYTES,
+    SLOW_QUERY_LOG_BACKUPS
+)
 
 
-db = sqlite3.connect(DATA_BASE_PATH)
-db.row_factory = sqlite3.Row
+class ConnectionPool:
+    """Bounded thread-safe pool of sqlite3 connections.
+
+    Every thread holds at most one connection at a time, nested cursors of
+    the same thread share it. Connection returns to the pool when outermost
+    cursor of thread is closed.
+
+    Parameters
+    ----------
+    path : str
+        Path to sqlite3 database file
+    size : int
+        Max count of connections that can be used at the same time
+    timeout : float
+        Seconds to wait for free connection before giving up
+    busy_timeout : int
+        Milliseconds sqlite3 waits for locked database
+    cache_size : int
+        Page cache size, negative value means size in KiB
+
+    """
+    def __init__(
+        self,
+        path: str,
+        size: int = DB_POOL_SIZE,
+        timeout: float = DB_POOL_TIMEOUT,
+        busy_timeout: int = DB_BUSY_TIMEOUT,
+        cache_size: int = DB_CACHE_SIZE
+    ):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self.busy_timeout = busy_timeout
+        self.cache_size = cache_size
+        self.closed = False
+
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._local = threading.local()
+
+    def connect(self) -> sqlite3.Connection:
+        """Opens new tuned connection to database
+
+        Returns
+        -------
+        sqlite3.Connection
+
+        """
+        if directory := os.path.dirname(self.path):
+            os.makedirs(directory, exist_ok=True)
+
+        connection = sqlite3.connect(
+            self.path,
+            timeout=self.busy_timeout / 1000,
+            check_same_thread=False
+        )
+        connection.row_factory = sqlite3.Row
+
+        # Takes effect only for new database, before anything is written to
+        # it. Free pages can be given back to file system step by step only
+        # with incremental auto vacuum, see maintenance.py.
+        connection.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        connection.execute("PRAGMA journal_mode = WAL")
+        connection.execute("PRAGMA synchronous = NORMAL")
+        connection.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout)}")
+        connection.execute(f"PRAGMA cache_size = {int(self.cache_size)}")
+
+        return connection
+
+    def acquire(self) -> sqlite3.Connection:
+        """Gives connection for current thread, waits for free one if all
+        connections are in use.
+
+        Returns
+        -------
+        sqlite3.Connection
+
+        Raises
+        ------
+        sqlite3.ProgrammingError
+            If pool is already closed
+        sqlite3.OperationalError
+            If no connection got free during timeout
+
+        """
+        local = self._local
+
+        if getattr(local, "depth", 0):
+            local.depth += 1
+            return local.connection
+
+        if self.closed:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed pool.")
+
+        if not self._slots.acquire(timeout=self.timeout):
+            raise sqlite3.OperationalError("Connection pool is exhausted.")
+
+        try:
+            connection = self._take_idle() or self.connect()
+        except BaseException:
+            self._slots.release()
+            raise
+
+        local.connection, local.depth = connection, 1
+        return connection
+
+    def release(self) -> None:
+        """Gives back connection of current thread to the pool. Uncommitted
+        changes are rolled back.
+        """
+        local = self._local
+        local.depth -= 1
+
+        if local.depth:
+            return
+
+        connection, local.connection = local.connection, None
+
+        try:
+            if connection.in_transaction:
+                connection.rollback()
+        except sqlite3.Error:
+            connection.close()
+        else:
+            if self.closed:
+                connection.close()
+            else:
+                self._idle.put(connection)
+        finally:
+            self._slots.release()
+
+    def clear(self) -> None:
+        """Closes idle connections, pool stays usable
+        """
+        while (connection := self._take_idle(check=False)) is not None:
+            connection.close()
+
+    def close(self) -> None:
+        """Closes idle connections and makes pool refuse new cursors.
+        Connections that are still in use get closed on release.
+        """
+        self.closed = True
+        self.clear()
+
+    def _take_idle(self, check: bool = True) -> sqlite3.Connection | None:
+        """Takes idle connection from the pool. Broken ones are dropped.
+
+        Parameters
+        ----------
+        check : bool, optional
+            Run health check for connection
+
+        Returns
+        -------
+        sqlite3.Connection | None
+
+        """
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                return
+
+            if not check or is_healthy(connection):
+                return connection
+
+            connection.close()
+
+
+def is_healthy(connection: sqlite3.Connection) -> bool:
+    """Health check for sqlite3 connection
+
+    Parameters
+    ----------
+    connection : sqlite3.Connection
+
+    Returns
+    -------
+    bool
+
+    """
+    try:
+        connection.execute("SELECT 1").fetchone()
+    except sqlite3.Error:
+        return False
+
+    return True
+
+
+pool = ConnectionPool(DATA_BASE_PATH)
+
+
+class MeasuredCursor(sqlite3.Cursor):
+    """Cursor that counts queries and time spent in them for metrics of
+    current request.
+
+    When slow query log is enabled, every statement is timed together
+    with fetching of its rows, statements that took at least threshold
+    are logged when the next statement starts or cursor is closed.
+    """
+    _statement: tuple | None = None
+
+    def execute(self, sql: str, *args):
+        return self._measure(super().execute, False, sql, *args)
+
+    def executemany(self, sql: str, *args):
+        return self._measure(super().executemany, True, sql, *args)
+
+    def executescript(self, *args):
+        record("sql_queries", 1)
+        with timed("sql_seconds"):
+            return super().executescript(*args)
+
+    def fetchone(self):
+        return self._fetch(super().fetchone)
+
+    def fetchmany(self, *args):
+        return self._fetch(super().fetchmany, *args)
+
+    def fetchall(self):
+        return self._fetch(super().fetchall)
+
+    def close(self):
+        self._finish_statement()
+        super().close()
+
+    def _measure(self, execute: Callable, many: bool, sql: str, *args):
+        self._finish_statement()
+        record("sql_queries", 1)
+        started: float = time.perf_counter()
+
+        try:
+            return execute(sql, *args)
+        finally:
+            elapsed: float = time.perf_counter() - started
+            record("sql_seconds", elapsed)
+
+            if SLOW_QUERY_THRESHOLD:
+                self._statement = (
+                    sql, args[0] if args else (), many, elapsed,
+                    sys._getframe(2)
+                )
+
+    def _fetch(self, fetch: Callable, *args):
+        started: float = time.perf_counter()
+
+        try:
+            return fetch(*args)
+        finally:
+            elapsed: float = time.perf_counter() - started
+            record("sql_seconds", elapsed)
+
+            if self._statement:
+                *statement, seconds, frame = self._statement
+                self._statement = (*statement, seconds + elapsed, frame)
+
+    def _finish_statement(self) -> None:
+        if not self._statement:
+            return
+
+        sql, params, many, seconds, frame = self._statement
+        self._statement = None
+
+        if seconds * 1000 >= SLOW_QUERY_THRESHOLD:
+            log_slow_query(
+                self.connection, sql, params, many, seconds, frame
+            )
+
+
+def log_slow_query(
+    connection: sqlite3.Connection,
+    sql: str,
+    params,
+    many: bool,
+    seconds: float,
+    frame
+) -> None:
+    """Writes slow statement with its query plan to slow query log
+
+    Parameters
+    ----------
+    connection : sqlite3.Connection
+        Connection that ran statement
+    sql : str
+    params : Any
+        Parameters of execute or parameters sets of executemany
+    many : bool
+        Whether statement was run by executemany
+    seconds : float
+        Time of statement with fetching of its rows
+    frame : FrameType
+        Frame that ran statement, caller is the first frame outside of
+        this module
+
+    """
+    while frame and frame.f_globals.get("__name__") == __name__:
+        frame = frame.f_back
+
+    # Plan of executemany is taken with its first parameters set, it is
+    # unavailable when parameters were given by exhausted iterator
+    bound = next(iter(params), ()) if many else params
+
+    plan: list = []
+    if sql.lstrip()[:7].upper().startswith(EXPLAINED_STATEMENTS):
+        try:
+            plan = [
+                row[-1] for row in connection.execute(
+                    f"EXPLAIN QUERY PLAN {sql}", bound
+                )
+            ]
+        except sqlite3.Error as error:
+            plan = [f"unavailable: {error}"]
+
+    slow_query_logger().info(json.dumps({
+        "time": time.time(),
+        "ms": round(seconds * 1000, 3),
+        "sql": " ".join(sql.split()),
+        "params": {key: type(value).__name__ for key, value in bound.items()}
+        if isinstance(bound, dict) else [type(value).__name__
+                                         for value in bound],
+        "many": many,
+        "caller": frame and (
+            f"{frame.f_globals.get('__name__')}.{frame.f_code.co_name}:"
+            f"{frame.f_lineno}"
+        ),
+        "plan": plan,
+    }))
+
+
+def slow_query_logger() -> logging.Logger:
+    """Returns logger of slow queries, creates rotating file on first use
+
+    Returns
+    -------
+    logging.Logger
+
+    """
+    logger = logging.getLogger("slow_queries")
+
+    with _slow_query_logger_lock:
+        if not logger.handlers:
+            if directory := os.path.dirname(SLOW_QUERY_LOG_PATH):
+                os.makedirs(directory, exist_ok=True)
+
+            handler = RotatingFileHandler(
+                SLOW_QUERY_LOG_PATH,
+                maxBytes=SLOW_QUERY_LOG_MAX_BYTES,
+                backupCount=SLOW_QUERY_LOG_BACKUPS
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+
+    return logger
+
+
+_slow_query_logger_lock = threading.Lock()
+
+EXPLAINED_STATEMENTS: tuple = (
+    "SELECT", "INSERT", "UPDATE", "DELETE", "REPLACE", "WITH"
+)
 
 
 class CursorContextManager:
-    """Context manager for sqlite3 cursor
+    """Context manager for sqlite3 cursor. Takes connection for current
+    thread from pool if connection isn't given. Queries are counted in
+    metrics of current request.
     """
-    def __init__(self, connection):
+    def __init__(self, connection: sqlite3.Connection | None = None):
         self.connection = connection
 
     def __enter__(self):
-        self.cursor = self.connection.cursor()
+        self.pooled = self.connection is None
+
+        if self.pooled:
+            self.connection = pool.acquire()
+
+        self.cursor = self.connection.cursor(MeasuredCursor)
         return self.cursor
 
     def __exit__(self, exc_type, exc_value, traceback):
         self.cursor.close()
 
+        if self.pooled:
+            self.connection = None
+            pool.release()
+
+
+class GroupCommitWriter:
+    """Dedicated writer thread that runs write operations of concurrent
+    requests in batches, one transaction and so one fsync per batch.
+
+    Every operation runs inside its own savepoint, failed operation is
+    rolled back alone and its caller gets the error. Callers get results
+    only after the batch is committed.
+
+    Parameters
+    ----------
+    max_batch : int
+        Max count of operations in one transaction
+    max_delay : float
+        Seconds to wait for more operations after first one came
+    timeout : float
+        Seconds caller waits for result of operation
+
+    """
+    def __init__(
+        self,
+        max_batch: int = DB_WRITE_MAX_BATCH,
+        max_delay: float = DB_WRITE_MAX_DELAY,
+        timeout: float = DB_WRITE_TIMEOUT
+    ):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.closed = False
+
+        self._lock = threading.Lock()
+        self._pid: int | None = None
+        self._running = False
+
+    def execute(self, operation: Callable[[sqlite3.Cursor], Any]) -> Any:
+        """Runs operation inside writer thread, waits until its batch
+        is committed.
+
+        Parameters
+        ----------
+        operation : Callable[[sqlite3.Cursor], Any]
+            Function that makes changes by given cursor, must not commit
+
+        Returns
+        -------
+        Any
+            Result of operation
+
+        Raises
+        ------
+        sqlite3.ProgrammingError
+            If writer is already closed
+        sqlite3.OperationalError
+            If batch wasn't committed in time or writer thread stopped
+
+        """
+        if self.closed:
+            raise sqlite3.ProgrammingError(
+                "Cannot operate on a closed writer."
+            )
+
+        future: Future = Future()
+        self._submit((operation, future))
+
+        record("sql_queries", 1)
+        with timed("sql_seconds"):
+            try:
+                return future.result(timeout=self.timeout)
+            except FutureTimeoutError:
+                # Operation that already runs can't be cancelled, it may
+                # still be committed
+                future.cancel()
+                raise sqlite3.OperationalError(
+                    f"Write wasn't done in {self.timeout} seconds."
+                ) from None
+
+    def close(self) -> None:
+        """Commits operations that are already queued then stops thread
+        """
+        self.closed = True
+
+        with self._lock:
+            if self._pid != os.getpid() or not self._running:
+                return
+
+            self._queue.put(None)
+
+        self._thread.join()
+
+    def _submit(self, item: tuple) -> None:
+        """Queues operation. Starts writer thread on first write and after
+        previous thread stopped. Threads don't survive fork, so forked
+        worker starts its own one.
+
+        Parameters
+        ----------
+        item : tuple
+            Operation and future for its result
+
+        """
+        with self._lock:
+            if self._pid != os.getpid() or not self._running:
+                self._pid = os.getpid()
+                self._running = True
+                self._queue: queue.Queue = queue.Queue()
+                self._thread = threading.Thread(
+                    target=self._run,
+                    name="db-writer",
+                    daemon=True
+                )
+                self._thread.start()
+
+            self._queue.put(item)
+
+    def _run(self) -> None:
+        """Collects batches of operations and commits them. Connection is
+        opened again after it fails. Operations that are still queued when
+        thread stops for any reason get an error.
+        """
+        connection: sqlite3.Connection | None = None
+        batch: list = []
+        stopping = False
+
+        try:
+            while not stopping:
+                if (item := self._queue.get()) is None:
+                    break
+
+                batch = [item]
+                deadline: float = time.monotonic() + self.max_delay
+
+                while len(batch) < self.max_batch:
+                    try:
+                        item = self._queue.get(
+                            timeout=max(deadline - time.monotonic(), 0)
+                        )
+                    except queue.Empty:
+                        break
+
+                    if item is None:
+                        stopping = True
+                        break
+
+                    batch.append(item)
+
+                try:
+                    if connection is None:
+                        connection = pool.connect()
+                        connection.isolation_level = None
+
+                    self._commit(connection, batch)
+                except Exception as error:
+                    fail_operations(batch, error)
+
+                    if connection is not None:
+                        close_quietly(connection)
+                        connection = None
+        finally:
+            with self._lock:
+                self._running = False
+                pending: list = batch
+
+                while not self._queue.empty():
+                    if item := self._queue.get_nowait():
+                        pending.append(item)
+
+            fail_operations(
+                pending,
+                sqlite3.OperationalError("Writer stopped.")
+            )
+
+            if connection is not None:
+                close_quietly(connection)
+
+    def _commit(self, connection: sqlite3.Connection, batch: list) -> None:
+        """Runs batch of operations in one transaction, operations that
+        were cancelled by timeout are skipped
+
+        Parameters
+        ----------
+        connection : sqlite3.Connection
+        batch : list
+            Pairs of operation and future for its result
+
+        """
+        outcomes: list = []
+
+        with CursorContextManager(connection) as cursor:
+            try:
+                cursor.execute("BEGIN IMMEDIATE")
+
+                for operation, future in batch:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+
+                    cursor.execute("SAVEPOINT operation")
+
+                    try:
+                        outcomes.append((future, operation(cursor), None))
+                    except Exception as error:
+                        cursor.execute("ROLLBACK TO operation")
+                        outcomes.append((future, None, error))
+
+                    cursor.execute("RELEASE operation")
+
+                cursor.execute("COMMIT")
+            except Exception as error:
+                if connection.in_transaction:
+                    cursor.execute("ROLLBACK")
+
+                fail_operations(batch, error)
+                return
+
+        for future, result, error in outcomes:
+            if error:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+
+def fail_operations(batch: list, error: Exception) -> None:
+    """Gives error to every operation of batch that has no result yet
+
+    Parameters
+    ----------
+    batch : list
+        Pairs of operation and future for its result
+    error : Exception
+
+    """
+    for _, future in batch:
+        if not future.done():
+            try:
+                future.set_exception(error)
+            except InvalidStateError:
+                pass
+
+
+def close_quietly(connection: sqlite3.Connection) -> None:
+    """Closes broken connection, errors of closing are ignored
+
+    Parameters
+    ----------
+    connection : sqlite3.Connection
+
+    """
+    try:
+        connection.close()
+    except sqlite3.Error:
+        pass
+
+
+writer = GroupCommitWriter()
+
+MIGRATIONS: list[tuple[str, ...]] = [
+    # 1. Base tables
+    (
+        '''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email TEXT UNIQUE CHECK(LENGTH(email) <= 36),
+            phone_number TEXT UNIQUE CHECK(LENGTH(phone_number) <= 36),
+            username TEXT NOT NULL CHECK(LENGTH(username) <= 16),
+            password TEXT NOT NULL CHECK(LENGTH(password) <= 500)
+        );
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS notes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL CHECK(LENGTH(title) <= 150),
+            body TEXT CHECK(LENGTH(body) <= 10000),
+            created TEXT NOT NULL,
+            author_id INTEGER NOT NULL,
+            deleted INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY (author_id) REFERENCES users(id)
+        );
+        ''',
+    ),
+    # 2. Indexes for feed, counts of live posts and author lookups
+    (
+        '''
+        CREATE INDEX IF NOT EXISTS notes_live_id
+        ON notes (id) WHERE deleted = 0;
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS notes_author_id ON notes (author_id);
+        ''',
+    ),
+    # 3. Data versions for cache invalidation across processes
+    (
+        '''
+        CREATE TABLE IF NOT EXISTS data_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID;
+        ''',
+        "INSERT OR IGNORE INTO data_versions (name) VALUES ('notes');",
+        *(
+            f'''
+            CREATE TRIGGER IF NOT EXISTS notes_version_{event.lower()}
+            AFTER {event} ON notes
+            BEGIN
+                UPDATE data_versions SET version = version + 1
+                WHERE name = 'notes';
+            END;
+            '''
+            for event in ("INSERT", "UPDATE", "DELETE")
+        ),
+    ),
+    # 4. Per post version and modification time for conditional GET
+    (
+        "ALTER TABLE notes ADD COLUMN version INTEGER NOT NULL DEFAULT 1;",
+        "ALTER TABLE notes ADD COLUMN updated INTEGER;",
+        '''
+        CREATE TRIGGER IF NOT EXISTS notes_post_version
+        AFTER UPDATE OF title, body, deleted ON notes
+        BEGIN
+            UPDATE notes SET
+                version = old.version + 1,
+                updated = CAST(strftime('%s', 'now') AS INTEGER)
+            WHERE id = new.id;
+        END;
+        ''',
+    ),
+    # 5. Recently changed notes for catching up in-process title index
+    (
+        "CREATE INDEX IF NOT EXISTS notes_updated ON notes (updated);",
+    ),
+    # 6. Excerpts of bodies, feed is read from covering index only, so
+    # full bodies and their overflow pages aren't touched. Length of
+    # backfilled excerpt is EXCERPT_LENGTH at the time of migration.
+    (
+        "ALTER TABLE notes ADD COLUMN excerpt TEXT NOT NULL DEFAULT '';",
+        "ALTER TABLE notes ADD COLUMN body_length INTEGER NOT NULL DEFAULT 0;",
+        "ALTER TABLE notes ADD COLUMN has_body INTEGER NOT NULL DEFAULT 0;",
+        '''
+        UPDATE notes SET
+            excerpt = SUBSTR(COALESCE(body, ''), 1, 300),
+            body_length = LENGTH(COALESCE(body, '')),
+            has_body = COALESCE(body, '') != '';
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS notes_feed ON notes (
+            id, author_id, title, created, excerpt, body_length, has_body
+        ) WHERE deleted = 0;
+        ''',
+    ),
+    # 7. Posts of author, newest first, without touching rows of others.
+    # Replaces index on author_id alone, it is prefix of this one.
+    (
+        '''
+        CREATE INDEX IF NOT EXISTS notes_author_live
+        ON notes (author_id, deleted, id);
+        ''',
+        "DROP INDEX IF EXISTS notes_author_id;",
+    ),
+    # 8. Archive of deleted posts that are past retention window, see
+    # maintenance.py. Updated time of deleted post is time of deletion,
+    # posts deleted without it get time of migration.
+    (
+        '''
+        CREATE TABLE IF NOT EXISTS notes_archive (
+            id INTEGER PRIMARY KEY,
+            title TEXT NOT NULL,
+            body TEXT,
+            created TEXT NOT NULL,
+            author_id INTEGER NOT NULL,
+            updated INTEGER,
+            archived INTEGER NOT NULL
+        );
+        ''',
+        '''
+        UPDATE notes SET updated = CAST(strftime('%s', 'now') AS INTEGER)
+        WHERE deleted = 1 AND updated IS NULL;
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS notes_deleted
+        ON notes (updated) WHERE deleted = 1;
+        ''',
+    ),
+    # 9. Counts of live posts, author_id 0 is row of all posts. Triggers
+    # keep them in the same transaction as change of notes.
+    (
+        '''
+        CREATE TABLE IF NOT EXISTS post_counters (
+            author_id INTEGER PRIMARY KEY,
+            live INTEGER NOT NULL DEFAULT 0
+        );
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS notes_counters_insert
+        AFTER INSERT ON notes WHEN new.deleted = 0
+        BEGIN
+            INSERT OR IGNORE INTO post_counters (author_id)
+            VALUES (0), (new.author_id);
+            UPDATE post_counters SET live = live + 1
+            WHERE author_id IN (0, new.author_id);
+        END;
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS notes_counters_update
+        AFTER UPDATE OF deleted, author_id ON notes
+        WHEN old.deleted != new.deleted OR old.author_id != new.author_id
+        BEGIN
+            UPDATE post_counters SET live = live - 1
+            WHERE old.deleted = 0 AND author_id IN (0, old.author_id);
+            INSERT OR IGNORE INTO post_counters (author_id)
+            SELECT new.author_id WHERE new.deleted = 0;
+            UPDATE post_counters SET live = live + 1
+            WHERE new.deleted = 0 AND author_id IN (0, new.author_id);
+        END;
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS notes_counters_delete
+        AFTER DELETE ON notes WHEN old.deleted = 0
+        BEGIN
+            UPDATE post_counters SET live = live - 1
+            WHERE author_id IN (0, old.author_id);
+        END;
+        ''',
+        "INSERT OR IGNORE INTO post_counters (author_id) VALUES (0);",
+        '''
+        INSERT OR REPLACE INTO post_counters (author_id, live)
+        SELECT 0, COUNT(*) FROM notes WHERE deleted = 0
+        UNION ALL
+        SELECT author_id, COUNT(*) FROM notes WHERE deleted = 0
+        GROUP BY author_id;
+        ''',
+    ),
+    # 10. Feed indexes that planner picks by itself, with statistics or
+    # without them. Home feed index leads with deleted, equality on it
+    # wins over primary key. Index of live ids is prefix of it. Author
+    # feed index is covering too, so it isn't outweighed by home feed one.
+    (
+        "DROP INDEX IF EXISTS notes_feed;",
+        "DROP INDEX IF EXISTS notes_live_id;",
+        '''
+        CREATE INDEX IF NOT EXISTS notes_live_feed ON notes (
+            deleted, id, author_id, title, created, excerpt, body_length,
+            has_body
+        ) WHERE deleted = 0;
+        ''',
+        "DROP INDEX IF EXISTS notes_author_live;",
+        '''
+        CREATE INDEX IF NOT EXISTS notes_author_feed ON notes (
+            author_id, deleted, id, title, created, excerpt, body_length,
+            has_body
+        );
+        ''',
+    ),
+]
+"""Schema migrations, position in list + 1 is schema version that is
+stored in PRAGMA user_version. Append new migrations, never edit applied
+ones.
+"""
+
+
+def migrate() -> int:
+    """Applies migrations that database doesn't have yet, every migration in
+    its own transaction. Runs ANALYZE if something was applied, so query
+    planner knows about new indexes.
+
+    Returns
+    -------
+    int
+        Schema version of database
+
+    """
+    with CursorContextManager() as cursor:
+        applied: bool = False
+
+        while True:
+            # Write lock first, so concurrently started processes don't
+            # apply same migration twice.
+            cursor.execute("BEGIN IMMEDIATE")
+            version: int = cursor.execute("PRAGMA user_version").fetchone()[0]
+
+            if version >= len(MIGRATIONS):
+                cursor.connection.rollback()
+                break
+
+            for statement in MIGRATIONS[version]:
+                cursor.execute(statement)
+
+            cursor.execute(f"PRAGMA user_version = {version + 1}")
+            cursor.connection.commit()
+            applied = True
+
+        if applied:
+            cursor.execute("ANALYZE")
+            cursor.connection.commit()
+
+    return version
+
+
+def init_notes_search() -> bool:
+    """Creates FTS5 index over notes title/body and triggers that keep it in
+    sync with notes table. Only live (not deleted) posts are indexed.
+    Index that is created for existing database gets backfilled.
+
+    Returns
+    -------
+    bool
+        False if sqlite3 build doesn't support FTS5
+
+    """
+    with CursorContextManager() as cursor:
+        created: bool = not cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'notes_fts'"
+        ).fetchone()
+
+        try:
+            cursor.executescript(
+                '''
+                CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(
+                    title,
+                    body,
+                    content='notes',
+                    content_rowid='id'
+                );
+
+                CREATE TRIGGER IF NOT EXISTS notes_fts_insert
+                AFTER INSERT ON notes WHEN new.deleted = 0
+                BEGIN
+                    INSERT INTO notes_fts (rowid, title, body)
+                    VALUES (new.id, new.title, new.body);
+                END;
+
+                CREATE TRIGGER IF NOT EXISTS notes_fts_update
+                AFTER UPDATE OF title, body, deleted ON notes
+                BEGIN
+                    INSERT INTO notes_fts (notes_fts, rowid, title, body)
+                    SELECT 'delete', old.id, old.title, old.body
+                    WHERE old.deleted = 0;
+                    INSERT INTO notes_fts (rowid, title, body)
+                    SELECT new.id, new.title, new.body
+                    WHERE new.deleted = 0;
+                END;
+
+                CREATE TRIGGER IF NOT EXISTS notes_fts_delete
+                AFTER DELETE ON notes WHEN old.deleted = 0
+                BEGIN
+                    INSERT INTO notes_fts (notes_fts, rowid, title, body)
+                    VALUES ('delete', old.id, old.title, old.body);
+                END;
+                '''
+            )
+        except sqlite3.OperationalError:
+            return False
+
+        cursor.connection.commit()
+
+    if created:
+        rebuild_notes_search()
+
+    return True
+
+
+def rebuild_notes_search() -> int:
+    """Drops everything from FTS5 index then fills it again from live posts.
+    Used as one-time backfill for databases created before search index.
+
+    Returns
+    -------
+    int
+        Count of indexed posts
 
-def init_users_table():
-    """Creates users table inside db
     """
-    with CursorContextManager(db) as cursor:
+    with CursorContextManager() as cursor:
         cursor.execute(
+            "INSERT INTO notes_fts (notes_fts) VALUES ('delete-all')"
+        )
+        indexed: int = cursor.execute(
             '''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                email TEXT UNIQUE CHECK(LENGTH(email) <= 36),
-                phone_number TEXT UNIQUE CHECK(LENGTH(phone_number) <= 36),
-                username TEXT NOT NULL CHECK(LENGTH(username) <= 16),
-                password TEXT NOT NULL CHECK(LENGTH(password) <= 500)
-            );
+            INSERT INTO notes_fts (rowid, title, body)
+            SELECT id, title, body FROM notes WHERE deleted = 0
             '''
+        ).rowcount
+        cursor.connection.commit()
+
+    return indexed
+
+
+POST_COUNTERS_QUERY: str = '''
+    SELECT 0 AS author_id, COUNT(*) AS live FROM notes WHERE deleted = 0
+    UNION ALL
+    SELECT author_id, COUNT(*) FROM notes WHERE deleted = 0
+    GROUP BY author_id
+'''
+
+
+def check_post_counters() -> list[tuple[int, int, int]]:
+    """Compares counts of live posts kept by triggers with real ones.
+    Authors without live posts may have zero counter or none.
+
+    Returns
+    -------
+    list[tuple[int, int, int]]
+        Author id (0 for all posts), kept count and real count of every
+        counter that is wrong
+
+    """
+    with CursorContextManager() as cursor:
+        kept: dict = dict(
+            cursor.execute("SELECT author_id, live FROM post_counters")
         )
-    db.commit()
+        real: dict = dict(cursor.execute(POST_COUNTERS_QUERY))
+
+    return [
+        (author_id, kept.get(author_id, 0), real.get(author_id, 0))
+        for author_id in sorted(kept.keys() | real.keys())
+        if kept.get(author_id, 0) != real.get(author_id, 0)
+    ]
 
 
-def init_notes_table():
-    """Creates notes table inside db
+def rebuild_post_counters() -> int:
+    """Counts live posts again and replaces all counters
+
+    Returns
+    -------
+    int
+        Count of live posts
+
     """
-    with CursorContextManager(db) as cursor:
+    with CursorContextManager() as cursor:
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute("DELETE FROM post_counters")
         cursor.execute(
-            '''
-            CREATE TABLE IF NOT EXISTS notes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL CHECK(LENGTH(title) <= 150),
-                body TEXT CHECK(LENGTH(body) <= 10000),
-                created TEXT NOT NULL,
-                author_id INTEGER NOT NULL,
-                deleted INTEGER NOT NULL DEFAULT 0,
-                FOREIGN KEY (author_id) REFERENCES users(id)
-            );
-            '''
+            "INSERT INTO post_counters (author_id, live) "
+            + POST_COUNTERS_QUERY
         )
-    db.commit()
+        live: int = cursor.execute(
+            "SELECT live FROM post_counters WHERE author_id = 0"
+        ).fetchone()[0]
+        cursor.connection.commit()
+
+    return live
@@ -0,0 +1,249 @@
+""" Archival of deleted posts and giving free pages back to file system
+
+Deleted posts stay in notes table only for retention window, then they are
+moved to notes_archive. Every batch is one short operation of writer
+thread, so requests' writes wait at most for one batch. Free pages are
+released by incremental vacuum in small steps the same way. WAL is
+checkpointed in passive mode, which never waits for readers or writers.
+"""
+import time
+from typing import Iterator
+
+from data_base import CursorContextManager, writer
+from config import (
+    ARCHIVE_RETENTION_DAYS,
+    ARCHIVE_BATCH_SIZE,
+    VACUUM_STEP_PAGES,
+    MAINTENANCE_PAUSE
+)
+
+
+ARCHIVE_COLUMNS: str = "id, title, body, created, author_id, updated"
+
+
+def archive_deleted_posts(
+    retention_days: float = ARCHIVE_RETENTION_DAYS,
+    batch_size: int = ARCHIVE_BATCH_SIZE,
+    pause: float = MAINTENANCE_PAUSE
+) -> Iterator[int]:
+    """ Moves posts deleted more than retention_days ago to notes_archive,
+        yields count of moved posts after every batch
+
+    Parameters
+    ----------
+    retention_days : float, optional
+    batch_size : int, optional
+        Posts per write operation
+    pause : float, optional
+        Seconds between batches
+
+    """
+    cutoff: int = int(time.time() - retention_days * 86400)
+
+    def move_batch(cursor) -> int:
+        post_ids: list = [
+            post["id"] for post in cursor.execute(
+                '''
+                SELECT id FROM notes
+                WHERE deleted = 1 AND updated < ?
+                LIMIT ?
+                ''',
+                (cutoff, batch_size)
+            )
+        ]
+
+        if post_ids:
+            placeholders: str = ", ".join("?" * len(post_ids))
+            cursor.execute(
+                f'''
+                INSERT OR REPLACE INTO notes_archive (
+                    {ARCHIVE_COLUMNS}, archived
+                )
+                SELECT {ARCHIVE_COLUMNS},
+                CAST(strftime('%s', 'now') AS INTEGER)
+                FROM notes WHERE id IN ({placeholders})
+                ''',
+                post_ids
+            )
+            cursor.execute(
+                f'DELETE FROM notes WHERE id IN ({placeholders})',
+                post_ids
+            )
+
+        return len(post_ids)
+
+    moved: int = 0
+
+    while count := writer.execute(move_batch):
+        moved += count
+        yield moved
+
+        if count < batch_size:
+            break
+
+        time.sleep(pause)
+
+
+def vacuum_free_pages(
+    step_pages: int = VACUUM_STEP_PAGES,
+    pause: float = MAINTENANCE_PAUSE
+) -> int:
+    """ Gives free pages back to file system with incremental vacuum,
+        step_pages per write operation. Does nothing for databases
+        without incremental auto vacuum, see enable_incremental_vacuum.
+
+    Parameters
+    ----------
+    step_pages : int, optional
+    pause : float, optional
+        Seconds between steps
+
+    Returns
+    -------
+    int
+        Count of released pages
+
+    """
+    def vacuum_step(cursor) -> int:
+        # sqlite3 module steps PRAGMA statement once, and every step of
+        # incremental_vacuum releases one page.
+        for _ in range(step_pages):
+            cursor.execute("PRAGMA incremental_vacuum(1)")
+
+        return cursor.execute("PRAGMA freelist_count").fetchone()[0]
+
+    if (stats := storage_stats())["auto_vacuum"] != "incremental":
+        return 0
+
+    released: int = 0
+    free_pages: int = stats["freelist_count"]
+
+    while free_pages:
+        left: int = writer.execute(vacuum_step)
+        released += free_pages - left
+
+        if left >= free_pages:
+            break
+
+        free_pages = left
+        time.sleep(pause)
+
+    return released
+
+
+def checkpoint_wal(mode: str = "PASSIVE") -> dict:
+    """ Copies WAL frames into database file
+
+    Parameters
+    ----------
+    mode : str, optional
+        PASSIVE never blocks, TRUNCATE also empties WAL file but waits for
+        readers and writers
+
+    Returns
+    -------
+    dict
+        busy, wal_frames, checkpointed_frames
+
+    """
+    if mode not in ("PASSIVE", "FULL", "RESTART", "TRUNCATE"):
+        raise ValueError(f"Unknown checkpoint mode {mode}.")
+
+    with CursorContextManager() as cursor:
+        busy, wal_frames, checkpointed_frames = cursor.execute(
+            f"PRAGMA wal_checkpoint({mode})"
+        ).fetchone()
+
+    return {
+        "busy": bool(busy),
+        "wal_frames": wal_frames,
+        "checkpointed_frames": checkpointed_frames,
+    }
+
+
+def storage_stats() -> dict:
+    """ Takes size of database file in pages
+
+    Returns
+    -------
+    dict
+        page_size, page_count, freelist_count, auto_vacuum
+
+    """
+    with CursorContextManager() as cursor:
+        stats: dict = {
+            name: cursor.execute(f"PRAGMA {name}").fetchone()[0]
+            for name in (
+                "page_size", "page_count", "freelist_count", "auto_vacuum"
+            )
+        }
+
+    stats["auto_vacuum"] = ("none", "full", "incremental")[
+        stats["auto_vacuum"]
+    ]
+
+    return stats
+
+
+def enable_incremental_vacuum() -> bool:
+    """ Turns on incremental auto vacuum for database that was created
+        without it. Rebuilds whole database file with VACUUM, which holds
+        write lock until it is done, so it is supposed to be run once
+        during maintenance window.
+
+    Returns
+    -------
+    bool
+        False if it was already enabled
+
+    """
+    if storage_stats()["auto_vacuum"] == "incremental":
+        return False
+
+    with CursorContextManager() as cursor:
+        cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        cursor.execute("VACUUM")
+
+    return True
+
+
+def run_maintenance(
+    retention_days: float = ARCHIVE_RETENTION_DAYS,
+    batch_size: int = ARCHIVE_BATCH_SIZE,
+    step_pages: int = VACUUM_STEP_PAGES
+) -> dict:
+    """ Archives deleted posts, vacuums free pages and checkpoints WAL
+
+    Parameters
+    ----------
+    retention_days : float, optional
+    batch_size : int, optional
+    step_pages : int, optional
+
+    Returns
+    -------
+    dict
+        Report with archived posts, released pages and bytes, pages
+        before and after, free pages left and checkpoint result
+
+    """
+    before: dict = storage_stats()
+    archived: int = 0
+
+    for archived in archive_deleted_posts(retention_days, batch_size):
+        pass
+
+    released: int = vacuum_free_pages(step_pages)
+    checkpoint: dict = checkpoint_wal()
+    after: dict = storage_stats()
+
+    return {
+        "archived_posts": archived,
+        "released_pages": released,
+        "released_bytes": released * after["page_size"],
+        "page_count_before": before["page_count"],
+        "page_count_after": after["page_count"],
+        "free_pages_left": after["freelist_count"],
+        "auto_vacuum": after["auto_vacuum"],
+        **checkpoint,
+    }
@@ -0,0 +1,308 @@
+""" Maintenance commands for our application database and static files
+
+Usage
+-----
+python manage.py migrate
+python manage.py rebuild-search
+python manage.py check-counters
+python manage.py rebuild-counters
+python manage.py build-assets
+python manage.py import notes notes.jsonl
+python manage.py export users users.jsonl
+python manage.py maintain --every 3600
+python manage.py enable-incremental-vacuum
+"""
+import sys
+import time
+import argparse
+
+from assets import build_assets
+from bulk_data import (
+    BULK_TABLES,
+    import_rows,
+    export_rows,
+    read_jsonl,
+    write_jsonl,
+    report_progress
+)
+from data_base import (
+    writer,
+    migrate,
+    init_notes_search,
+    rebuild_notes_search,
+    check_post_counters,
+    rebuild_post_counters
+)
+from maintenance import run_maintenance, enable_incremental_vacuum
+from config import (
+    ARCHIVE_RETENTION_DAYS,
+    ARCHIVE_BATCH_SIZE,
+    VACUUM_STEP_PAGES
+)
+
+
+def migrate_db(args: argparse.Namespace) -> None:
+    """ Upgrades database schema to the latest version
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+
+    """
+    print(f"Database schema version is {migrate()}.")
+
+
+def rebuild_search(args: argparse.Namespace) -> None:
+    """ Creates FTS5 search index if needed and fills it from live posts
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+
+    """
+    if not init_notes_search():
+        print("FTS5 isn't available, search falls back to LIKE.")
+        return
+
+    print(f"Indexed {rebuild_notes_search()} posts.")
+
+
+def check_counters(args: argparse.Namespace) -> None:
+    """ Compares counters of live posts with real counts, exits with
+        status 1 if any of them is wrong
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+
+    """
+    if not (wrong := check_post_counters()):
+        print("Post counters are consistent.")
+        return
+
+    for author_id, kept, real in wrong:
+        print(
+            f"{'all posts' if author_id == 0 else f'author {author_id}'}: "
+            f"counter {kept}, real {real}"
+        )
+
+    sys.exit(1)
+
+
+def rebuild_counters(args: argparse.Namespace) -> None:
+    """ Counts live posts again and replaces all counters
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+
+    """
+    print(f"Counted {rebuild_post_counters()} live posts.")
+
+
+def build_static(args: argparse.Namespace) -> None:
+    """ Writes content hashed and precompressed copies of static files
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+
+    """
+    print(f"Built {len(build_assets())} static files.")
+
+
+def import_table(args: argparse.Namespace) -> None:
+    """ Streams rows from JSONL file into table, "-" reads stdin
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+
+    """
+    migrate()
+
+    with open_file(args.file, "r") as file:
+        report_progress(import_rows(
+            args.table,
+            read_jsonl(file),
+            chunk_size=args.chunk_size,
+            transaction_size=args.transaction_size
+        ))
+
+
+def export_table(args: argparse.Namespace) -> None:
+    """ Streams rows of table to JSONL file, "-" writes to stdout
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+
+    """
+    with open_file(args.file, "w") as file:
+        report_progress(
+            write_jsonl(file, export_rows(args.table)),
+            every=100000
+        )
+
+
+def maintain(args: argparse.Namespace) -> None:
+    """ Archives old deleted posts, releases free pages and checkpoints WAL,
+        once or every given seconds, prints report of every run
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+
+    """
+    migrate()
+
+    try:
+        while True:
+            report: dict = run_maintenance(
+                args.retention_days,
+                args.batch_size,
+                args.step_pages
+            )
+            print(
+                time.strftime("%Y-%m-%d %H:%M:%S"),
+                " ".join(f"{name}={value}" for name, value in report.items()),
+                flush=True
+            )
+
+            if not args.every:
+                break
+
+            time.sleep(args.every)
+    finally:
+        writer.close()
+
+
+def enable_vacuum(args: argparse.Namespace) -> None:
+    """ Rebuilds database file with incremental auto vacuum turned on
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+
+    """
+    if enable_incremental_vacuum():
+        print("Incremental vacuum is enabled.")
+    else:
+        print("Incremental vacuum is already enabled.")
+
+
+def open_file(path: str, mode: str):
+    """ Opens file for bulk commands, "-" is stdin or stdout
+    """
+    if path == "-":
+        return open(
+            (sys.stdin if mode == "r" else sys.stdout).fileno(),
+            mode,
+            encoding="utf-8",
+            closefd=False
+        )
+
+    return open(path, mode, encoding="utf-8")
+
+
+def main() -> None:
+    """ Parses command line arguments and runs chosen command
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(required=True)
+
+    commands.add_parser(
+        "migrate",
+        help="apply pending schema migrations"
+    ).set_defaults(func=migrate_db)
+
+    commands.add_parser(
+        "rebuild-search",
+        help="backfill full-text search index from existing posts"
+    ).set_defaults(func=rebuild_search)
+
+    commands.add_parser(
+        "check-counters",
+        help="compare counters of live posts with real counts"
+    ).set_defaults(func=check_counters)
+
+    commands.add_parser(
+        "rebuild-counters",
+        help="count live posts again and replace counters"
+    ).set_defaults(func=rebuild_counters)
+
+    commands.add_parser(
+        "build-assets",
+        help="write content hashed and precompressed static files"
+    ).set_defaults(func=build_static)
+
+    import_parser = commands.add_parser(
+        "import",
+        help="stream rows from JSONL file into table"
+    )
+    import_parser.add_argument("table", choices=BULK_TABLES)
+    import_parser.add_argument("file", help='JSONL file, "-" for stdin')
+    import_parser.add_argument("--chunk-size", type=int, default=5000)
+    import_parser.add_argument(
+        "--transaction-size",
+        type=int,
+        default=200000,
+        help="rows per transaction"
+    )
+    import_parser.set_defaults(func=import_table)
+
+    export_parser = commands.add_parser(
+        "export",
+        help="stream rows of table to JSONL file"
+    )
+    export_parser.add_argument("table", choices=BULK_TABLES)
+    export_parser.add_argument(
+        "file",
+        nargs="?",
+        default="-",
+        help='JSONL file, "-" for stdout'
+    )
+    export_parser.set_defaults(func=export_table)
+
+    maintain_parser = commands.add_parser(
+        "maintain",
+        help="archive old deleted posts, release free pages, checkpoint WAL"
+    )
+    maintain_parser.add_argument(
+        "--retention-days",
+        type=float,
+        default=ARCHIVE_RETENTION_DAYS,
+        help="archive posts deleted earlier than that"
+    )
+    maintain_parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=ARCHIVE_BATCH_SIZE,
+        help="posts moved per write"
+    )
+    maintain_parser.add_argument(
+        "--step-pages",
+        type=int,
+        default=VACUUM_STEP_PAGES,
+        help="pages released per write"
+    )
+    maintain_parser.add_argument(
+        "--every",
+        type=float,
+        default=0,
+        help="repeat after that many seconds, 0 runs once"
+    )
+    maintain_parser.set_defaults(func=maintain)
+
+    commands.add_parser(
+        "enable-incremental-vacuum",
+        help="rebuild database file with incremental auto vacuum, "
+             "holds write lock while it runs"
+    ).set_defaults(func=enable_vacuum)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,399 @@
+""" Per-route latency, SQL, template and password hashing metrics in
+Prometheus text format. Values are kept per process, every pre-forked
+worker reports its own ones.
+
+Attributes
+----------
+LATENCY_BUCKETS : tuple
+    Upper bounds of request duration histogram, in seconds
+SIZE_BUCKETS : tuple
+    Upper bounds of response size histogram, in bytes
+KNOWN_METHODS : frozenset
+    HTTP methods that are kept in labels, others are recorded as OTHER
+registry : MetricsRegistry
+    Metrics of this process
+"""
+import time
+import threading
+import contextvars
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+from wheezy.http import HTTPRequest, not_found
+
+
+LATENCY_BUCKETS: tuple = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+    2.5, 5.0
+)
+
+SIZE_BUCKETS: tuple = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+KNOWN_METHODS: frozenset = frozenset((
+    "GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"
+))
+
+_request_metrics = contextvars.ContextVar("request_metrics", default=None)
+
+
+class Histogram:
+    """ Cumulative histogram with Prometheus semantics
+
+    Parameters
+    ----------
+    buckets : tuple
+        Sorted upper bounds, +Inf is added
+
+    """
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def samples(self) -> list[tuple[str, float]]:
+        """ Returns cumulative bucket counts by their "le" label
+
+        Returns
+        -------
+        list[tuple[str, float]]
+
+        """
+        samples: list = []
+        total: int = 0
+
+        for bound, count in zip((*self.buckets, "+Inf"), self.counts):
+            total += count
+            samples.append((str(bound), total))
+
+        return samples
+
+
+class MetricsRegistry:
+    """ Thread-safe storage of request metrics
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.durations: dict = defaultdict(
+            lambda: Histogram(LATENCY_BUCKETS)
+        )
+        self.sizes: dict = defaultdict(lambda: Histogram(SIZE_BUCKETS))
+        self.responses: dict = defaultdict(int)
+        self.counters: dict = defaultdict(float)
+        self.collectors: dict[str, Callable[[], dict]] = {}
+
+    def observe_request(
+        self,
+        route: str,
+        method: str,
+        status: int,
+        seconds: float,
+        size: int,
+        request_metrics: dict
+    ) -> None:
+        """ Records finished request
+
+        Parameters
+        ----------
+        route : str
+            Name of route
+        method : str
+            HTTP method, methods out of KNOWN_METHODS are recorded as OTHER
+        status : int
+        seconds : float
+            Duration of request
+        size : int
+            Size of response body
+        request_metrics : dict
+            SQL, template and hashing totals of request
+
+        """
+        if method not in KNOWN_METHODS:
+            method = "OTHER"
+
+        with self.lock:
+            self.durations[(route, method)].observe(seconds)
+            self.sizes[(route,)].observe(size)
+            self.responses[(route, method, status)] += 1
+
+            for name, value in request_metrics.items():
+                self.counters[(name, route)] += value
+
+    def add_collector(self, name: str, collect: Callable[[], dict]) -> None:
+        """ Adds source of gauges rendered with every scrape, e.g. stats
+            of cache
+
+        Parameters
+        ----------
+        name : str
+            Value of "cache" label
+        collect : Callable[[], dict]
+            Returns values by their names
+
+        """
+        self.collectors[name] = collect
+
+    def render(self) -> str:
+        """ Renders all metrics in Prometheus text exposition format
+
+        Returns
+        -------
+        str
+
+        """
+        lines: list = []
+
+        with self.lock:
+            lines.append("# TYPE app_request_duration_seconds histogram")
+            for (route, method), histogram in sorted(self.durations.items()):
+                labels: str = f'route="{route}",method="{method}"'
+                render_histogram(
+                    lines, "app_request_duration_seconds", labels, histogram
+                )
+
+            lines.append("# TYPE app_response_size_bytes histogram")
+            for (route,), histogram in sorted(self.sizes.items()):
+                render_histogram(
+                    lines, "app_response_size_bytes", f'route="{route}"',
+                    histogram
+                )
+
+            lines.append("# TYPE app_responses_total counter")
+            for (route, method, status), count in sorted(
+                self.responses.items()
+            ):
+                lines.append(
+                    f'app_responses_total{{route="{route}",method="{method}",'
+                    f'status="{status}"}} {count}'
+                )
+
+            for name in sorted({name for name, _ in self.counters}):
+                lines.append(f"# TYPE app_{name}_total counter")
+                for (counter, route), value in sorted(self.counters.items()):
+                    if counter == name:
+                        lines.append(
+                            f'app_{name}_total{{route="{route}"}} {value:g}'
+                        )
+
+        stats: dict = {
+            cache: collect() for cache, collect in self.collectors.items()
+        }
+        for field in sorted({field for values in stats.values()
+                             for field in values}):
+            kind: str = "counter" if field in ("hits", "misses") else "gauge"
+            suffix: str = "_total" if kind == "counter" else ""
+            lines.append(f"# TYPE app_cache_{field}{suffix} {kind}")
+
+            for cache, values in sorted(stats.items()):
+                if field in values:
+                    lines.append(
+                        f'app_cache_{field}{suffix}{{cache="{cache}"}} '
+                        f'{values[field]}'
+                    )
+
+        return "\n".join(lines) + "\n"
+
+
+def render_histogram(
+    lines: list,
+    name: str,
+    labels: str,
+    histogram: Histogram
+) -> None:
+    """ Appends lines of histogram samples
+
+    Parameters
+    ----------
+    lines : list
+    name : str
+    labels : str
+        Rendered labels without braces
+    histogram : Histogram
+
+    """
+    for bound, count in histogram.samples():
+        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+
+    lines.append(f"{name}_sum{{{labels}}} {histogram.sum:g}")
+    lines.append(f"{name}_count{{{labels}}} {sum(histogram.counts)}")
+
+
+def record(name: str, value: float) -> None:
+    """ Adds value to metric of current request, does nothing outside of
+        request
+
+    Parameters
+    ----------
+    name : str
+        Metric name, e.g. "sql_queries" or "sql_seconds"
+    value : float
+
+    """
+    if (request_metrics := _request_metrics.get()) is not None:
+        request_metrics[name] = request_metrics.get(name, 0) + value
+
+
+@contextmanager
+def timed(name: str) -> Iterator[None]:
+    """ Adds time spent inside context to metric of current request
+
+    Parameters
+    ----------
+    name : str
+        Metric name, e.g. "template_seconds"
+
+    """
+    started: float = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - started)
+
+
+def timed_render_template(render_template: Callable) -> Callable:
+    """ Wraps render_template option of application to measure templates
+
+    Parameters
+    ----------
+    render_template : Callable
+
+    Returns
+    -------
+    Callable
+
+    """
+    def render(template_name: str, kwargs: dict) -> str:
+        with timed("template_seconds"):
+            return render_template(template_name, kwargs)
+
+    return render
+
+
+class MetricsMiddleware:
+    """ Records latency, status and size of every response by name of
+        route. Responses that come from http cache middleware have
+        "cache" route. Has to be first middleware after bootstrap.
+    """
+    def __init__(self, registry: "MetricsRegistry"):
+        self.registry = registry
+
+    def __call__(self, request: HTTPRequest, following) -> "MeasuredResponse":
+        request_metrics: dict = {}
+        token = _request_metrics.set(request_metrics)
+        started: float = time.perf_counter()
+
+        try:
+            response = following(request)
+        finally:
+            _request_metrics.reset(token)
+
+        return MeasuredResponse(
+            response or not_found(),
+            request,
+            started,
+            request_metrics,
+            self.registry
+        )
+
+
+class MeasuredResponse:
+    """ Wraps any response (including cached ones), records request when
+        response is written, that is when status and size are known.
+        Streamed bodies are recorded when they end.
+    """
+    __slots__ = ("inner", "request", "started", "request_metrics", "registry")
+
+    def __init__(
+        self,
+        inner,
+        request: HTTPRequest,
+        started: float,
+        request_metrics: dict,
+        registry: "MetricsRegistry"
+    ):
+        self.inner = inner
+        self.request = request
+        self.started = started
+        self.request_metrics = request_metrics
+        self.registry = registry
+
+    def __call__(self, start_response):
+        status: list = []
+
+        def capture_status(response_status: str, headers: list, *args):
+            status.append(response_status)
+            return start_response(response_status, headers, *args)
+
+        buffer = self.inner(capture_status)
+
+        if not isinstance(buffer, (list, tuple)):
+            return self.measure_stream(buffer, int(status[0][:3]))
+
+        self.observe(int(status[0][:3]), sum(map(len, buffer)))
+
+        return buffer
+
+    def measure_stream(self, buffer, status: int) -> Iterator[bytes]:
+        """ Passes streamed body through, queries made while it is read
+            are counted too. Request is recorded when body ends.
+        """
+        size: int = 0
+        chunks = iter(buffer)
+
+        try:
+            while True:
+                token = _request_metrics.set(self.request_metrics)
+                try:
+                    chunk: bytes = next(chunks)
+                except StopIteration:
+                    break
+                finally:
+                    _request_metrics.reset(token)
+
+                size += len(chunk)
+                yield chunk
+        finally:
+            if hasattr(buffer, "close"):
+                buffer.close()
+
+            self.observe(status, size)
+
+    def observe(self, status: int, size: int) -> None:
+        route_args = self.request.environ.get("route_args")
+        self.registry.observe_request(
+            route_args.get("route_name", "unknown") if route_args is not None
+            else "cache",
+            self.request.method,
+            status,
+            time.perf_counter() - self.started,
+            size,
+            self.request_metrics
+        )
+
+
+def metrics_middleware_factory(options: dict) -> MetricsMiddleware:
+    """ Metrics middleware factory, also wraps render_template option to
+        measure time of templates
+
+    Parameters
+    ----------
+    options : dict
+        Default options dict from wheezy.http WSGIApplication
+
+    Returns
+    -------
+    MetricsMiddleware
+
+    """
+    options["render_template"] = timed_render_template(
+        options["render_template"]
+    )
+    return MetricsMiddleware(registry)
+
+
+registry = MetricsRegistry()
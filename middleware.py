@@ -0,0 +1,52 @@
+""" Custom middlewares for wheezy.http WSGIApplication
+"""
+from wheezy.http import HTTPRequest, HTTPResponse
+
+from controllers.cache_controllers import (
+    take_notes_version,
+    sync_notes_version
+)
+
+
+class NotesVersionMiddleware:
+    """ Puts notes data version to environ of GET requests of pages that
+        page cache keeps, their cache key varies by it. Caches of this
+        process are dropped when version changes. Cache middleware has to
+        follow this one.
+
+    Parameters
+    ----------
+    paths : set
+        Paths without leading slash that need notes version
+
+    """
+    def __init__(self, paths: set):
+        self.paths = paths
+
+    def __call__(self, request: HTTPRequest, following) -> HTTPResponse:
+        if request.method == "GET" and (
+            request.environ["PATH_INFO"].lstrip("/") in self.paths
+        ):
+            sync_notes_version(version := take_notes_version())
+            request.environ["NOTES_VERSION"] = str(version)
+
+        return following(request)
+
+
+def notes_version_middleware_factory(options: dict) -> NotesVersionMiddleware:
+    """ Notes version middleware factory, version is taken only for pages
+        that are kept in page cache
+
+    Parameters
+    ----------
+    options : dict
+        Default options dict from wheezy.http WSGIApplication
+
+    Returns
+    -------
+    NotesVersionMiddleware
+
+    """
+    path_for = options["path_for"]
+
+    return NotesVersionMiddleware({path_for("home"), path_for("search")})
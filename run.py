@@ -1,6 +1,9 @@
 """ Running file for whole WSGI application
 """
+import argparse
+
 from wheezy.http import WSGIApplication
+from wheezy.http.middleware import http_cache_middleware_factory
 from wheezy.html.utils import html_escape
 from wheezy.template.engine import Engine
 from wheezy.template.loader import FileLoader
@@ -13,43 +16,141 @@ from wheezy.web.middleware import (
 )
 
 from urls import all_urls
-from data_base import init_users_table, init_notes_table
+from template_engine import PrecompiledEngine
+from assets import assets_bootstrap, load_manifest
+from caches import http_cache
+from metrics import metrics_middleware_factory
+from middleware import notes_version_middleware_factory
+from config import (
+    SERVER_HOST,
+    SERVER_PORT,
+    SERVER_THREADS,
+    SERVER_WORKERS,
+    SERVER_MAX_REQUESTS,
+    TEMPLATES_PATH,
+    TEMPLATE_CACHE_PATH
+)
+from data_base import pool, writer, migrate, init_notes_search
+from controllers.cache_controllers import sync_title_index
+from controllers.hashing_controllers import hasher
 
 
-def construct_app() -> WSGIApplication:
+def construct_app(production: bool = False) -> WSGIApplication:
     """ Constructs wsgi application for our server with it's full configuration
 
+    Parameters
+    ----------
+    production : bool, optional
+        Compiles all templates before serving, compiled code is kept in
+        template cache directory. Fails if any template doesn't compile.
+
     Returns
     -------
     WSGIApplication
 
     """
-    engine = Engine(
-        loader=FileLoader(["templates"]),
-        extensions=[
-            CoreExtension(),
-            WidgetExtension(),
-        ],
-    )
+    loader = FileLoader([TEMPLATES_PATH])
+    extensions: list = [
+        CoreExtension(),
+        WidgetExtension(),
+    ]
+
+    if production:
+        engine = PrecompiledEngine(loader, extensions, TEMPLATE_CACHE_PATH)
+    else:
+        engine = Engine(loader=loader, extensions=extensions)
+
     engine.global_vars.update({"h": html_escape})
 
+    if production:
+        engine.precompile()
+
     main = WSGIApplication(
         middleware=[
             bootstrap_defaults(url_mapping=all_urls),
+            assets_bootstrap(load_manifest()),
+            metrics_middleware_factory,
+            notes_version_middleware_factory,
+            http_cache_middleware_factory,
             path_routing_middleware_factory,
         ],
-        options={"render_template": WheezyTemplate(engine)},
+        options={
+            "render_template": WheezyTemplate(engine),
+            "http_cache": http_cache,
+        },
     )
     return main
 
 
+def parse_args() -> argparse.Namespace:
+    """ Parses command line arguments for serving modes
+
+    Returns
+    -------
+    argparse.Namespace
+
+    """
+    parser = argparse.ArgumentParser(description="Runs WSGI application")
+    parser.add_argument(
+        "--production",
+        action="store_true",
+        help="serve with pre-forked workers and thread pools"
+    )
+    parser.add_argument(
+        "--asgi",
+        action="store_true",
+        help="serve ASGI application with uvicorn, see asgi.py"
+    )
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--threads", type=int, default=SERVER_THREADS)
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS)
+    parser.add_argument(
+        "--max-requests",
+        type=int,
+        default=SERVER_MAX_REQUESTS,
+        help="recycle worker after that count of requests, 0 means never"
+    )
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
     from wsgiref.simple_server import make_server
-    main = construct_app()
+    args = parse_args()
+    main = construct_app(production=args.production)
     try:
-        init_notes_table()
-        init_users_table()
-        print("Visit http://localhost:8080/")
-        make_server("", 8080, main).serve_forever()
+        migrate()
+        init_notes_search()
+        sync_title_index()
+        print(f"Visit http://{args.host or 'localhost'}:{args.port}/")
+
+        if args.asgi:
+            try:
+                import uvicorn
+            except ImportError:
+                raise SystemExit("ASGI mode needs uvicorn installed.")
+
+            uvicorn.run(
+                "asgi:app",
+                host=args.host or "0.0.0.0",
+                port=args.port,
+                workers=args.workers
+            )
+        elif args.production:
+            from server import run_production
+            run_production(
+                main,
+                args.host,
+                args.port,
+                threads=args.threads,
+                workers=args.workers,
+                max_requests=args.max_requests
+            )
+        else:
+            make_server(args.host, args.port, main).serve_forever()
     except KeyboardInterrupt:
         print("\nThanks!")
+    finally:
+        writer.close()
+        pool.close()
+        hasher.close()
@@ -0,0 +1,562 @@
+""" Production WSGI server for our application.
+
+Every worker process serves requests on a thread pool, workers are
+pre-forked and share one listening socket. Connections are kept alive
+between requests, idle ones wait in a selector instead of holding a thread.
+Workers are recycled after configured count of requests.
+
+Signals for master process
+--------------------------
+SIGTERM, SIGINT
+    Graceful shutdown, workers finish requests that are in progress.
+SIGHUP
+    Graceful restart of workers, old workers finish their requests while
+    fresh ones take over the socket. Fresh workers are forked from master,
+    so they run code and config that master imported at startup, changes
+    on disk need full restart.
+"""
+import os
+import select
+import signal
+import socket
+import selectors
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.simple_server import (
+    ServerHandler,
+    WSGIRequestHandler,
+    WSGIServer
+)
+
+from data_base import pool, writer
+from controllers.hashing_controllers import hasher
+from config import (
+    SERVER_THREADS,
+    SERVER_WORKERS,
+    SERVER_KEEP_ALIVE,
+    SERVER_KEEP_ALIVE_REQUESTS,
+    SERVER_MAX_REQUESTS,
+    SERVER_GRACEFUL_TIMEOUT
+)
+
+
+class KeepAliveServerHandler(ServerHandler):
+    """wsgiref handler that answers with HTTP/1.1 and tells client when
+    connection is going to be closed.
+    """
+    http_version = "1.1"
+
+    def cleanup_headers(self):
+        super().cleanup_headers()
+
+        request_handler = self.request_handler
+
+        # Without Content-Length client can find end of response only by
+        # closed connection.
+        if "Content-Length" not in self.headers or not (
+            request_handler.can_keep_alive()
+        ):
+            request_handler.close_connection = True
+
+        if request_handler.close_connection:
+            self.headers["Connection"] = "close"
+
+
+class KeepAliveRequestHandler(WSGIRequestHandler):
+    """Request handler that serves many requests over one connection.
+    When there is no buffered request it gives idle connection back to
+    the server instead of waiting for next one.
+    """
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        self.timeout = self.server.keep_alive
+        self.parked = False
+        super().setup()
+
+    def handle(self):
+        """Handles requests until connection gets closed or idle
+        """
+        self.close_connection = True
+        self.handle_one_request()
+
+        while not self.close_connection:
+            if not self.has_pending_request():
+                self.parked = True
+                return
+
+            self.handle_one_request()
+
+    def handle_one_request(self):
+        """Handles single HTTP request, same as wsgiref does
+        """
+        try:
+            self.raw_requestline = self.rfile.readline(65537)
+        except (TimeoutError, ConnectionError):
+            self.close_connection = True
+            return
+
+        if len(self.raw_requestline) > 65536:
+            self.requestline = ''
+            self.request_version = ''
+            self.command = ''
+            self.send_error(414)
+            self.close_connection = True
+            return
+
+        if not self.raw_requestline:
+            self.close_connection = True
+            return
+
+        if not self.parse_request():
+            return
+
+        handler = KeepAliveServerHandler(
+            self.rfile, self.wfile, self.get_stderr(), self.get_environ(),
+            multithread=True,
+            multiprocess=self.server.multiprocess,
+        )
+        handler.request_handler = self
+        handler.run(self.server.get_app())
+
+        self.server.count_request(self.connection)
+
+    def can_keep_alive(self) -> bool:
+        """Checks if connection may stay open after current response
+
+        Returns
+        -------
+        bool
+
+        """
+        return not self.server.stopping and (
+            self.server.served_on(self.connection) + 1
+            < SERVER_KEEP_ALIVE_REQUESTS
+        )
+
+    def has_pending_request(self) -> bool:
+        """Checks without blocking if next request is already received
+
+        Returns
+        -------
+        bool
+
+        """
+        self.connection.settimeout(0)
+        try:
+            return bool(self.rfile.peek(1))
+        except OSError:
+            return False
+        finally:
+            self.connection.settimeout(self.timeout)
+
+
+class ThreadPoolWSGIServer(WSGIServer):
+    """WSGI server that handles requests on a bounded thread pool and
+    stops itself after max_requests requests. Idle keep-alive connections
+    are watched by a single selector thread and return to the pool when
+    next request arrives.
+
+    Parameters
+    ----------
+    server_address : tuple
+        Host and port
+    threads : int
+        Count of threads that handle requests
+    keep_alive : float
+        Seconds to wait for next request on idle connection
+    max_requests : int
+        Count of requests after which server stops, 0 means never
+
+    """
+    multiprocess = False
+
+    def __init__(
+        self,
+        server_address: tuple,
+        threads: int = SERVER_THREADS,
+        keep_alive: float = SERVER_KEEP_ALIVE,
+        max_requests: int = SERVER_MAX_REQUESTS
+    ):
+        super().__init__(server_address, KeepAliveRequestHandler)
+        self.threads = threads
+        self.keep_alive = keep_alive
+        self.max_requests = max_requests
+
+        self.stopping = False
+        self.handled_requests = 0
+        self.connections: dict = {}
+        self._lock = threading.Lock()
+
+    def serve(self) -> None:
+        """Serves until stop is called then waits for requests
+        that are in progress.
+        """
+        self.executor = ThreadPoolExecutor(
+            self.threads,
+            thread_name_prefix="wsgi"
+        )
+        self.selector = selectors.DefaultSelector()
+        self.parked: list = []
+        self._wakeup, self._waker = socket.socketpair()
+        self._wakeup.setblocking(False)
+        self.selector.register(self._wakeup, selectors.EVENT_READ)
+
+        idle_watcher = threading.Thread(
+            target=self.watch_idle,
+            name="wsgi-idle",
+            daemon=True
+        )
+        idle_watcher.start()
+
+        try:
+            self.serve_forever()
+        finally:
+            self._waker.send(b"\0")
+            idle_watcher.join()
+            self.executor.shutdown(wait=True)
+            self._waker.close()
+            self._wakeup.close()
+
+    def stop(self) -> None:
+        """Stops accepting new connections. Safe to call from signal handler
+        and from request threads.
+        """
+        if self.stopping:
+            return
+
+        self.stopping = True
+        threading.Thread(target=self.shutdown, daemon=True).start()
+
+    def count_request(self, connection: socket.socket) -> None:
+        """Counts handled request, stops server when limit is reached
+
+        Parameters
+        ----------
+        connection : socket.socket
+            Connection that request came from
+
+        """
+        with self._lock:
+            self.handled_requests += 1
+            self.connections[connection] = self.served_on(connection) + 1
+            exhausted = self.handled_requests == self.max_requests
+
+        if exhausted:
+            self.stop()
+
+    def served_on(self, connection: socket.socket) -> int:
+        """Count of requests that are served on connection
+
+        Parameters
+        ----------
+        connection : socket.socket
+
+        Returns
+        -------
+        int
+
+        """
+        return self.connections.get(connection, 0)
+
+    def get_request(self):
+        request, client_address = super().get_request()
+
+        # wsgiref writes headers and body separately, with Nagle's algorithm
+        # every keep-alive response would wait for delayed ACK.
+        request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return request, client_address
+
+    def process_request(self, request, client_address):
+        # Client that connected but didn't send request yet waits in the
+        # selector like idle keep-alive connection.
+        if not select.select([request], [], [], 0)[0]:
+            self.park(request, client_address)
+            return
+
+        self.executor.submit(
+            self.process_request_thread,
+            request,
+            client_address
+        )
+
+    def process_request_thread(self, request, client_address):
+        """Same as socketserver.ThreadingMixIn.process_request_thread,
+        but idle keep-alive connection is parked instead of being closed.
+        """
+        try:
+            handler = self.RequestHandlerClass(request, client_address, self)
+        except Exception:
+            self.handle_error(request, client_address)
+        else:
+            if handler.parked:
+                self.park(request, client_address)
+                return
+
+        self.shutdown_request(request)
+
+    def shutdown_request(self, request):
+        with self._lock:
+            self.connections.pop(request, None)
+
+        super().shutdown_request(request)
+
+    def park(self, request: socket.socket, client_address: tuple) -> None:
+        """Gives idle connection to the selector thread
+
+        Parameters
+        ----------
+        request : socket.socket
+        client_address : tuple
+
+        """
+        with self._lock:
+            if self.stopping:
+                parked = False
+            else:
+                parked = True
+                self.parked.append((request, client_address))
+
+        if not parked:
+            self.shutdown_request(request)
+            return
+
+        self._waker.send(b"\0")
+
+    def watch_idle(self) -> None:
+        """Waits for next requests on idle connections and passes them back
+        to the thread pool. Connections that stay idle longer than
+        keep_alive are closed.
+        """
+        idle: dict = {}
+
+        while not self.stopping:
+            for key, _ in self.selector.select(timeout=1.0):
+                if key.fileobj is self._wakeup:
+                    try:
+                        self._wakeup.recv(4096)
+                    except BlockingIOError:
+                        pass
+                    continue
+
+                self.selector.unregister(key.fileobj)
+                del idle[key.fileobj]
+                self.executor.submit(
+                    self.process_request_thread,
+                    key.fileobj,
+                    key.data
+                )
+
+            with self._lock:
+                parked, self.parked = self.parked, []
+
+            now = time.monotonic()
+
+            for request, client_address in parked:
+                self.selector.register(
+                    request,
+                    selectors.EVENT_READ,
+                    client_address
+                )
+                idle[request] = now + self.keep_alive
+
+            for request in [
+                request for request, expires in idle.items()
+                if expires <= now
+            ]:
+                self.selector.unregister(request)
+                del idle[request]
+                self.shutdown_request(request)
+
+        for request in list(idle) + [request for request, _ in self.parked]:
+            self.shutdown_request(request)
+
+        self.selector.close()
+
+
+class Arbiter:
+    """Master process that keeps pre-forked workers running
+
+    Parameters
+    ----------
+    server : ThreadPoolWSGIServer
+        Server with listening socket, shared by all workers
+    workers : int
+        Count of worker processes
+
+    """
+    def __init__(self, server: ThreadPoolWSGIServer, workers: int):
+        self.server = server
+        self.workers = workers
+        self.children: set = set()
+        self.retiring: set = set()
+        self.stopping = False
+        self.reloading = False
+
+    def run(self) -> None:
+        """Spawns workers and supervises them until shutdown signal
+        """
+        signal.signal(signal.SIGTERM, self.handle_stop)
+        signal.signal(signal.SIGINT, self.handle_stop)
+        signal.signal(signal.SIGHUP, self.handle_reload)
+
+        for _ in range(self.workers):
+            self.spawn()
+
+        while not self.stopping:
+            self.reap()
+
+            if self.reloading:
+                self.reloading = False
+                self.retire(set(self.children))
+
+            # Replaces recycled, crashed and retired workers
+            for _ in range(self.workers - len(self.children)):
+                self.spawn()
+
+            time.sleep(0.5)
+
+        self.retire(set(self.children))
+        self.wait()
+
+    def spawn(self) -> None:
+        """Forks new worker. Connections from pool are closed first, sqlite3
+        connections must not be shared between processes.
+        """
+        pool.clear()
+
+        if pid := os.fork():
+            self.children.add(pid)
+            return
+
+        try:
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            signal.signal(signal.SIGHUP, signal.SIG_IGN)
+            serve(self.server)
+        finally:
+            os._exit(0)
+
+    def retire(self, pids: set) -> None:
+        """Asks workers to stop gracefully
+
+        Parameters
+        ----------
+        pids : set
+
+        """
+        for pid in pids:
+            self.children.discard(pid)
+            self.retiring.add(pid)
+
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                self.retiring.discard(pid)
+
+    def reap(self) -> None:
+        """Collects exited workers, recycled ones are replaced in run loop
+        """
+        while True:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+
+            if not pid:
+                return
+
+            self.children.discard(pid)
+            self.retiring.discard(pid)
+
+    def wait(self) -> None:
+        """Waits for retiring workers, kills those that exceed
+        graceful timeout.
+        """
+        deadline = time.monotonic() + SERVER_GRACEFUL_TIMEOUT
+
+        while self.retiring and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.1)
+
+        for pid in self.retiring:
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+        self.reap()
+
+    def handle_stop(self, signum, frame):
+        self.stopping = True
+
+    def handle_reload(self, signum, frame):
+        self.reloading = True
+
+
+def serve(server: ThreadPoolWSGIServer) -> None:
+    """Runs server inside current process until SIGTERM or recycling
+
+    Parameters
+    ----------
+    server : ThreadPoolWSGIServer
+
+    """
+    signal.signal(signal.SIGTERM, lambda signum, frame: server.stop())
+
+    try:
+        server.serve()
+    finally:
+        writer.close()
+        pool.close()
+        hasher.close()
+
+
+def run_production(
+    app,
+    host: str,
+    port: int,
+    threads: int = SERVER_THREADS,
+    workers: int = SERVER_WORKERS,
+    max_requests: int = SERVER_MAX_REQUESTS,
+    keep_alive: float = SERVER_KEEP_ALIVE
+) -> None:
+    """Serves application with pre-forked workers, every worker has its
+    own thread pool. With single worker or without fork support serves
+    inside current process.
+
+    Parameters
+    ----------
+    app : WSGIApplication
+    host : str
+    port : int
+    threads : int, optional
+        Threads per worker
+    workers : int, optional
+        Count of worker processes
+    max_requests : int, optional
+        Worker is recycled after that count of requests, 0 means never
+    keep_alive : float, optional
+        Seconds to keep idle connection open
+
+    """
+    server = ThreadPoolWSGIServer(
+        (host, port),
+        threads=threads,
+        keep_alive=keep_alive,
+        max_requests=max_requests
+    )
+    server.set_app(app)
+
+    with server:
+        if workers > 1 and hasattr(os, "fork"):
+            server.multiprocess = True
+            Arbiter(server, workers).run()
+            return
+
+        signal.signal(signal.SIGINT, lambda signum, frame: server.stop())
+
+        # Single process can't be replaced by fresh one, recycling would
+        # just stop the server.
+        server.max_requests = 0
+        serve(server)
@@ -11,22 +11,96 @@ function enableScroll() {
 	document.body.style.overflow = "";
 }
 /**
- * Opens a window by fetching content from the specified URL and displaying 
- * it in a modal.
- * @param {Event} event - The click event that triggered the function.
- * @returns {Promise<undefined>} - A Promise that resolves when the window
- *  is opened.
+ * Url of batch endpoint that gives read-post dialogues of many posts.
  */
-async function openWindow(event) {
-	event.preventDefault();
+const READ_POSTS_URL = "/read_posts?ids=";
+/**
+ * Max count of posts in one batch request and in the page cache.
+ */
+const READ_POSTS_BATCH = 50;
+const POST_CACHE_SIZE = 100;
+/**
+ * Html of read-post dialogues by post url, the oldest entries are dropped
+ * when cache is full.
+ */
+const postCache = new Map();
+/**
+ * Puts html of post to cache, evicts the least recently used one.
+ * @param {string} url - Url of read-post dialogue.
+ * @param {string} content - Html of read-post dialogue.
+ */
+function cachePost(url, content) {
+	postCache.delete(url);
+	postCache.set(url, content);
 
-	const response = await fetch(event.target.getAttribute("href"));
+	if (postCache.size > POST_CACHE_SIZE) {
+		postCache.delete(postCache.keys().next().value);
+	}
+}
+/**
+ * Takes html of post from cache or fetches it.
+ * @param {string} url - Url of read-post dialogue.
+ * @returns {Promise<string>} - Html of read-post dialogue.
+ */
+async function takePost(url) {
+	if (postCache.has(url)) {
+		const content = postCache.get(url);
+		cachePost(url, content);
+		return content;
+	}
+
+	const response = await fetch(url);
 
 	if (!response.ok) {
 		throw new Error("Failed to fetch.");
 	}
 
 	const content = await response.text();
+	cachePost(url, content);
+
+	return content;
+}
+/**
+ * Fetches read-post dialogues of all posts on the page with batch requests
+ * and puts them to cache.
+ * @returns {Promise<undefined>}
+ */
+async function prefetchPosts() {
+	const urls = [...document.querySelectorAll("a.reading")]
+		.map(link => link.getAttribute("href"))
+		.filter(url => !postCache.has(url));
+	const byId = new Map(
+		urls.map(url => [url.split("/").pop(), url])
+	);
+	const ids = [...byId.keys()];
+
+	for (let start = 0; start < ids.length; start += READ_POSTS_BATCH) {
+		const batch = ids.slice(start, start + READ_POSTS_BATCH);
+		const response = await fetch(READ_POSTS_URL + batch.join(","));
+
+		if (!response.ok) {
+			return;
+		}
+
+		const posts = await response.json();
+		for (const [id, content] of Object.entries(posts)) {
+			cachePost(byId.get(id), content);
+		}
+	}
+}
+/**
+ * Opens a window with post from cache, fetches it if it isn't cached,
+ * and displays it in a modal.
+ * @param {Event} event - The click event that triggered the function.
+ * @returns {Promise<undefined>} - A Promise that resolves when the window
+ *  is opened.
+ */
+async function openWindow(event) {
+	event.preventDefault();
+
+	const content = await takePost(
+		event.currentTarget.getAttribute("href")
+	);
 	const element = document.getElementById("readPost");
 
 	element.innerHTML = content;
@@ -43,6 +117,27 @@ function addEventToReadPost() {
 	const readingLinks = document.querySelectorAll("a.reading");
 	readingLinks.forEach(link => link.addEventListener("click", openWindow));
 }
+/**
+ * Prefetches a post when pointer is over its link, for links that batch
+ * prefetch didn't cover.
+ * @param {Event} event - The mouseenter event.
+ */
+function prefetchOnHover(event) {
+	const url = event.currentTarget.getAttribute("href");
+
+	if (!postCache.has(url)) {
+		takePost(url).catch(() => undefined);
+	}
+}
+/**
+ * Adds hover prefetching to reading links and prefetches visible posts.
+ */
+function addPrefetch() {
+	document.querySelectorAll("a.reading").forEach(
+		link => link.addEventListener("mouseenter", prefetchOnHover)
+	);
+	prefetchPosts().catch(() => undefined);
+}
 /**
  * Closes the window and restores scrolling on the body element.
  * @param {Event} event - The click event that triggered the function.
@@ -73,3 +168,4 @@ function addEventToClose() {
 }
 
 document.addEventListener("DOMContentLoaded", addEventToReadPost);
+document.addEventListener("DOMContentLoaded", addPrefetch);
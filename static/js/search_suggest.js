@@ -0,0 +1,61 @@
+/**
+ * Url of endpoint that gives titles by their beginning.
+ */
+const SUGGEST_URL = "/search/suggest?q=";
+/**
+ * Controller of suggestions request in flight, it is aborted when user
+ * types next character.
+ */
+let suggestRequest = null;
+/**
+ * Fetches titles that start with text of search input and shows them as
+ * options of its datalist.
+ * @param {Event} event - The input event of search input.
+ * @returns {Promise<undefined>}
+ */
+async function showSuggestions(event) {
+	const query = event.target.value.trim();
+	const list = document.getElementById("suggestions");
+
+	if (suggestRequest) {
+		suggestRequest.abort();
+	}
+
+	if (!query) {
+		list.replaceChildren();
+		return;
+	}
+
+	suggestRequest = new AbortController();
+
+	try {
+		const response = await fetch(
+			SUGGEST_URL + encodeURIComponent(query),
+			{ signal: suggestRequest.signal }
+		);
+
+		if (!response.ok) {
+			return;
+		}
+
+		const suggestions = await response.json();
+		list.replaceChildren(...suggestions.map(suggestion => {
+			const option = document.createElement("option");
+			option.value = suggestion.title;
+			return option;
+		}));
+	} catch (error) {
+		if (error.name !== "AbortError") {
+			throw error;
+		}
+	}
+}
+/**
+ * Adds suggestions to search input.
+ */
+function addEventToSearchInput() {
+	const input = document.getElementById("sch_input");
+	input.addEventListener("input", showSuggestions);
+}
+
+document.addEventListener("DOMContentLoaded", addEventToSearchInput);
@@ -0,0 +1,138 @@
+""" Template engine that compiles every template up front and keeps
+generated code on disk, so new workers start with hot templates
+"""
+import os
+import sys
+import marshal
+import hashlib
+from types import CodeType, ModuleType
+
+import wheezy.template
+from wheezy.template.engine import Engine, complement_syntax_error
+from wheezy.template.comp import adjust_source_lineno
+
+
+class PrecompiledEngine(Engine):
+    """ wheezy.template Engine with persisted compiled templates.
+        Templates are looked up once, there are no freshness checks of
+        files, changed template source gets new cache entry.
+
+    Parameters
+    ----------
+    loader : Loader
+    extensions : list
+    cache_path : str | None, optional
+        Directory for compiled code, None disables persisting
+
+    """
+    def __init__(
+        self,
+        loader,
+        extensions: list,
+        cache_path: str | None = None
+    ):
+        super().__init__(loader=loader, extensions=extensions)
+        self.cache_path = cache_path
+
+    def precompile(self) -> int:
+        """ Compiles all templates of loader, raises error of first
+            template that fails to compile
+
+        Returns
+        -------
+        int
+            Count of compiled templates
+
+        """
+        names: tuple = self.loader.list_names()
+
+        for name in names:
+            self.get_template(name)
+
+        return len(names)
+
+    def compile_template(self, name: str) -> None:
+        with self.lock:
+            if name not in self.renders:
+                local_vars: dict = {}
+                exec(
+                    self.load_code(name, "render"),
+                    self.global_vars,
+                    local_vars
+                )
+
+                self.renders[name] = local_vars["render"]
+                self.templates[name] = self.template_class(
+                    name, local_vars["render"]
+                )
+
+    def compile_import(self, name: str) -> None:
+        with self.lock:
+            if name not in self.modules:
+                module = ModuleType(name)
+                module.__dict__.update(self.global_vars)
+                exec(self.load_code(name, "module"), module.__dict__)
+
+                self.modules[name] = module
+
+    def load_code(self, name: str, kind: str) -> CodeType:
+        """ Takes compiled code of template from cache directory or
+            compiles it and puts to cache
+
+        Parameters
+        ----------
+        name : str
+            Name of template
+        kind : str
+            "render" for templates, "module" for imports
+
+        Returns
+        -------
+        CodeType
+
+        """
+        if (template_source := self.loader.load(name)) is None:
+            raise IOError(f'Template "{name}" not found.')
+
+        path: str | None = self.cache_path and os.path.join(
+            self.cache_path,
+            hashlib.sha256(
+                "\0".join((
+                    name,
+                    kind,
+                    template_source,
+                    wheezy.template.__version__,
+                    sys.implementation.cache_tag,
+                )).encode()
+            ).hexdigest()
+        )
+
+        if path:
+            try:
+                with open(path, "rb") as file:
+                    return marshal.load(file)
+            except (OSError, EOFError, ValueError, TypeError):
+                pass
+
+        nodes: list = self.parser.parse(self.lexer.tokenize(template_source))
+        source: str = self.builder.build_render(nodes) if kind == "render" \
+            else self.builder.build_module(nodes)
+
+        try:
+            node = adjust_source_lineno(
+                source, name, self.compiler.source_lineno
+            )
+            code: CodeType = compile(node, name, "exec")
+        except SyntaxError as error:
+            raise complement_syntax_error(error, template_source, source)
+
+        if path:
+            os.makedirs(self.cache_path, exist_ok=True)
+            temporary: str = f"{path}.{os.getpid()}"
+
+            with open(temporary, "wb") as file:
+                marshal.dump(code, file)
+
+            os.replace(temporary, path)
+
+        return code
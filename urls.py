@@ -8,6 +8,8 @@ static_cache_profile : CacheProfile
     Wheezy.http CacheProfile object, defines caching headers for http
 static_files : Any
     Static files for out application
+assets : Any
+    Built content hashed static files, see assets.py
 """
 
 from wheezy.routing import url
@@ -16,6 +18,8 @@ from wheezy.web.handlers import file_handler
 from wheezy.http import response_cache, CacheProfile
 from wheezy.http.transforms import gzip_transform, response_transforms
 
+from assets import assets_handler
+
 from views.authentication_handlers import (
     RegisterHandler,
     LoginHandler,
@@ -24,13 +28,18 @@ from views.authentication_handlers import (
 from views.home_page_handlers import (
     IndexHandler,
     HomeHandler,
-    SearchHandler
+    MyPostsHandler,
+    SearchHandler,
+    SuggestHandler
 )
+from views.api_handlers import NotesApiHandler
+from views.metrics_handlers import MetricsHandler
 from views.posts_handlers import (
     CreatePostHandler,
     UpdatePostHandler,
     DeletePostHandler,
-    ReadPostHandler
+    ReadPostHandler,
+    ReadPostsHandler
 )
 
 static_cache_profile = CacheProfile(
@@ -48,16 +57,24 @@ static_files = response_cache(static_cache_profile)(
     (file_handler(root="static/"))
 )
 
+assets = assets_handler()
+
 all_urls = [
     url("", IndexHandler, name="index"),
     url("login", LoginHandler, name="login"),
     url("logout", LogOutHandler, name="logout"),
     url("search", SearchHandler, name="search"),
+    url("search/suggest", SuggestHandler, name="search_suggest"),
     url("register", RegisterHandler, name="register"),
     url("home", HomeHandler, {"page": 1}, name="home"),
+    url("my_posts", MyPostsHandler, name="my_posts"),
     url("create_post", CreatePostHandler, name="crate_post"),
     url("read_post/{post_id:i}", ReadPostHandler, name="read_post"),
+    url("read_posts", ReadPostsHandler, name="read_posts"),
     url("delete_post/{post_id:i}", DeletePostHandler, name="delete_post"),
     url("update_post/{post_id:i}", UpdatePostHandler, name="update_post"),
+    url("api/notes", NotesApiHandler, name="api_notes"),
+    url("metrics", MetricsHandler, name="metrics"),
     url("static/{path:any}", static_files, name="static"),
+    url("assets/{path:any}", assets, name="assets"),
 ]
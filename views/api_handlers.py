@@ -0,0 +1,58 @@
+import json
+from typing import Iterable
+
+from wheezy.http import HTTPResponse
+from wheezy.web.handlers import BaseHandler
+from wheezy.http.response import HTTP_STATUS, HTTP_HEADER_CACHE_CONTROL_DEFAULT
+
+from controllers.api_controllers import define_feed_filters, stream_notes
+
+
+class StreamingResponse(HTTPResponse):
+    """ Response with body from iterable, parts of body are written to
+        client as soon as they are made, without Content-Length.
+
+    Parameters
+    ----------
+    chunks : Iterable[bytes]
+    content_type : str, optional
+
+    """
+    def __init__(
+        self,
+        chunks: Iterable[bytes],
+        content_type: str = "application/json; charset=UTF-8"
+    ):
+        super().__init__(content_type)
+        self.buffer = chunks
+
+    def __call__(self, start_response) -> Iterable[bytes]:
+        if self.cache_policy:
+            self.cache_policy.extend(self.headers)
+        else:
+            self.headers.append(HTTP_HEADER_CACHE_CONTROL_DEFAULT)
+
+        start_response(HTTP_STATUS[self.status_code], self.headers)
+        return self.buffer
+
+
+class NotesApiHandler(BaseHandler):
+    def get(self) -> HTTPResponse:
+        """ Gives back page of notes as JSON, streamed from database.
+            Accepts cursor, limit, author_id and since query arguments.
+
+        Returns
+        -------
+        HTTPResponse
+            Wheezy.http response object
+
+        """
+        filters: dict | str = define_feed_filters(self.request.query)
+
+        if isinstance(filters, str):
+            response = HTTPResponse("application/json; charset=UTF-8")
+            response.status_code = 400
+            response.write(json.dumps({"error": filters}))
+            return response
+
+        return StreamingResponse(stream_notes(**filters))
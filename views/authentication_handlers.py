@@ -34,11 +34,13 @@ class RegisterHandler(BaseHandler):
         """
         request_form = self.request.form
 
-        if error := validate_registration(request_form):
+        if (
+            error := validate_registration(request_form)
+        ) or (
+            error := reg_new_acc(request_form)
+        ):
             return self.render_response("register.html", error=error)
 
-        reg_new_acc(request_form)
-
         return self.redirect_for("login")
 
 
@@ -1,10 +1,27 @@
+import json
+
+from wheezy.web import authorize
 from wheezy.web.handlers import BaseHandler
 from wheezy.http import HTTPResponse
 
+from caches import (
+    anonymous_response_cache,
+    page_cache_profile,
+    NOTES_DEPENDENCY
+)
 from controllers.users_controllers import define_session
 from controllers.errors_controllers import render_http_error
-from controllers.search_controllers import search_by_title_or_body
-from controllers.pages_controllers import define_current_page, init_pages
+from controllers.search_controllers import (
+    search_by_title_or_body,
+    suggest_titles
+)
+from controllers.pages_controllers import (
+    define_current_page,
+    define_cursor,
+    init_pages,
+    init_author_pages,
+    count_live_posts
+)
 
 
 class IndexHandler(BaseHandler):
@@ -21,6 +38,7 @@ class IndexHandler(BaseHandler):
 
 
 class HomeHandler(BaseHandler):
+    @anonymous_response_cache(page_cache_profile, NOTES_DEPENDENCY)
     def get(self) -> HTTPResponse:
         """ Handles pagination, renders home page
 
@@ -31,7 +49,28 @@ class HomeHandler(BaseHandler):
 
         """
         page: int = define_current_page(self.request.query)
-        items_on_page, total_pages = init_pages(page)
+
+        if not (cursor := define_cursor(self.request.query)):
+            return render_http_error(
+                404,
+                self.options,
+                self.helpers
+            )
+
+        items_on_page, total_pages = init_pages(page, *cursor)
+
+        if any(post_id is not None for post_id in cursor):
+            # Cursor past the end or on the wrong side gives nothing to show
+            if not items_on_page:
+                return render_http_error(
+                    404,
+                    self.options,
+                    self.helpers
+                )
+
+            # Label comes from the link, counting posts in front of cursor
+            # would make deep pages cost more than the first one
+            page = min(max(page, 1), total_pages)
 
         # TODO put here 404
         if page > total_pages or page < 1:
@@ -50,7 +89,50 @@ class HomeHandler(BaseHandler):
         )
 
 
+class MyPostsHandler(BaseHandler):
+    @authorize
+    def get(self) -> HTTPResponse:
+        """ Renders live posts of current user, newest first. Next pages
+            are given by "before" cursor.
+
+        Returns
+        -------
+        HTTPResponse
+            Wheezy.http response object
+
+        """
+        if not (cursor := define_cursor(self.request.query)) or (
+            cursor[0] is not None
+        ):
+            return render_http_error(
+                404,
+                self.options,
+                self.helpers
+            )
+
+        user_session: dict = define_session(self.principal)
+        author_id: int = int(user_session["user_id"])
+        items_on_page, next_cursor = init_author_pages(author_id, cursor[1])
+
+        # Cursor past the end gives nothing to show
+        if cursor[1] is not None and not items_on_page:
+            return render_http_error(
+                404,
+                self.options,
+                self.helpers
+            )
+
+        return self.render_response(
+            "my_posts.html",
+            items_on_page=items_on_page,
+            next_cursor=next_cursor,
+            posts_count=count_live_posts(author_id),
+            user_session=user_session
+        )
+
+
 class SearchHandler(BaseHandler):
+    @anonymous_response_cache(page_cache_profile)
     def get(self) -> HTTPResponse:
         """ Renders search page
 
@@ -60,7 +142,13 @@ class SearchHandler(BaseHandler):
             Wheezy.http response object
 
         """
-        return self.render_response("search.html", search_result=None)
+        return self.render_response(
+            "search.html",
+            search_result=None,
+            keyword="",
+            page=1,
+            has_next=False
+        )
 
     def post(self) -> HTTPResponse:
         """ Searches inside database post with keyword
@@ -73,9 +161,41 @@ class SearchHandler(BaseHandler):
 
         """
         keyword: str = self.request.form["search_keyword"][0]
-        search_result = search_by_title_or_body(keyword)
+        page: int = define_current_page(self.request.form)
+
+        if page < 1:
+            return render_http_error(
+                404,
+                self.options,
+                self.helpers
+            )
+
+        search_result, has_next = search_by_title_or_body(keyword, page)
 
         return self.render_response(
             "search.html",
-            search_result=search_result
+            search_result=search_result,
+            keyword=keyword,
+            page=page,
+            has_next=has_next
         )
+
+
+class SuggestHandler(BaseHandler):
+    def get(self) -> HTTPResponse:
+        """ Gives back titles that start with "q" query argument as JSON
+            list, answered from memory. Supposed to be used with XHR on
+            every keystroke in search input.
+
+        Returns
+        -------
+        HTTPResponse
+            Wheezy.http response object
+
+        """
+        response = HTTPResponse("application/json; charset=UTF-8")
+        response.write(json.dumps(
+            suggest_titles(self.request.query.get("q", [""])[0])
+        ))
+
+        return response
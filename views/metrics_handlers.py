@@ -0,0 +1,20 @@
+from wheezy.http import HTTPResponse
+from wheezy.web.handlers import BaseHandler
+
+from metrics import registry
+
+
+class MetricsHandler(BaseHandler):
+    def get(self) -> HTTPResponse:
+        """ Gives back metrics of this process in Prometheus text format
+
+        Returns
+        -------
+        HTTPResponse
+            Wheezy.http response object
+
+        """
+        response = HTTPResponse("text/plain; version=0.0.4; charset=utf-8")
+        response.write(registry.render())
+
+        return response
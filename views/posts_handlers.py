@@ -1,10 +1,16 @@
+import json
+
 from wheezy.web import authorize
-from wheezy.http import HTTPResponse
+from wheezy.http import HTTPResponse, HTTPCachePolicy
 from wheezy.web.handlers import BaseHandler
 from wheezy.core.collections import first_item_adapter
 
+from config import READ_POSTS_MAX
 from controllers.notes_controllers import (
     validate_post,
+    take_posts,
+    define_post_ids,
+    define_post_validators,
     create_post,
     update_post,
     delete_post
@@ -15,7 +21,8 @@ from controllers.users_controllers import define_session
 class ReadPostHandler(BaseHandler):
     def get(self) -> HTTPResponse:
         """ Gives back html for read-post dialogue.
-            Supposed to be used with XHR.
+            Supposed to be used with XHR. Answers 304 Not Modified when
+            client already has current version of post.
 
         Returns
         -------
@@ -30,10 +37,64 @@ class ReadPostHandler(BaseHandler):
         ):
             return self.redirect_for("home")
 
-        return self.render_response(
-            "read-post.html",
-            post=current_post,
-        )
+        etag, last_modified = define_post_validators(current_post)
+        environ: dict = self.request.environ
+
+        if (
+            etag in environ.get("HTTP_IF_NONE_MATCH", "")
+            if "HTTP_IF_NONE_MATCH" in environ
+            else environ.get("HTTP_IF_MODIFIED_SINCE") == last_modified
+        ):
+            response = HTTPResponse()
+            response.status_code = 304
+        else:
+            response = self.render_response(
+                "read-post.html",
+                post=current_post,
+            )
+
+        response.cache_policy = HTTPCachePolicy("private")
+        response.cache_policy.max_age(0)
+        response.cache_policy.must_revalidate()
+        response.headers.extend((
+            ("ETag", etag),
+            ("Last-Modified", last_modified),
+        ))
+
+        return response
+
+
+class ReadPostsHandler(BaseHandler):
+    def get(self) -> HTTPResponse:
+        """ Gives back html of read-post dialogues for many posts as JSON
+            object by post ids, all posts are taken by single query.
+            Supposed to be used with XHR for prefetching.
+
+        Returns
+        -------
+        HTTPResponse
+            Wheezy.http response object
+
+        """
+        response = HTTPResponse("application/json; charset=UTF-8")
+
+        if (post_ids := define_post_ids(
+            self.request.query.get("ids", [""])[0],
+            READ_POSTS_MAX
+        )) is None:
+            response.status_code = 400
+            response.write(json.dumps({
+                "error": f"Give from 1 to {READ_POSTS_MAX} comma separated "
+                         "post ids."
+            }))
+            return response
+
+        response.write(json.dumps({
+            post_id: self.render_template("read-post.html", post=post)
+            for post_id, post in take_posts(post_ids).items()
+        }))
+
+        return response
 
 
 class CreatePostHandler(BaseHandler):